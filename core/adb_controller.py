@@ -7,17 +7,120 @@ ADB控制器模块
 """
 
 import os
+import re
+import time
+import queue
+import asyncio
+import struct
 import subprocess
-from typing import Optional, Tuple, Union, List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, Union, List, Dict, Callable, Iterable, Sequence
+
+import numpy as np
+
+# 持久化shell中用于标记命令结束的哨兵，后面紧跟命令的退出码
+_SHELL_SENTINEL = b"__END__"
+# 合并输入命令时单条shell命令的长度上限，为安卓shell的ARG_MAX留出余量
+_BATCH_PAYLOAD_LIMIT = 8 * 1024
+# 合并输入时每个操作完成后输出的标记行，失败时据此得知已经执行了几个操作
+_BATCH_OP_DONE = "__OP_DONE__"
+# 命令超时(秒)，防止adb卡死时整个脚本停住
+_DEFAULT_TIMEOUT = 5.0
+_INPUT_TIMEOUT = 2.0  # 每个输入操作的基础超时，滑动/长按另加其持续时间
+_TRANSFER_TIMEOUT = 30.0  # 截图等传输数据的命令
+
+# 常用命令的参数前缀，调用时直接拼接参数，无需格式化再拆分字符串
+_DEVICES = ("devices",)
+_CONNECT = ("connect",)
+_TAP = ("shell", "input", "tap")
+_SWIPE = ("shell", "input", "swipe")
+_FORCE_STOP = ("shell", "am", "force-stop")
+_MONKEY = ("shell", "monkey", "-p")
+_GETEVENT_PROBE = ("shell", "getevent", "-pl")
+_WM_SIZE = ("shell", "wm", "size")
+
+# sendevent 使用的输入事件编号(linux/input-event-codes.h)
+_EV_SYN, _EV_KEY, _EV_ABS = 0, 1, 3
+_BTN_TOUCH = 330
+_ABS_MT_SLOT, _ABS_MT_POSITION_X, _ABS_MT_POSITION_Y, _ABS_MT_TRACKING_ID = 47, 53, 54, 57
+_AXIS_MAX_RE = re.compile(r"\bmax (\d+)")
+_SIZE_RE = re.compile(r"(\d+)x(\d+)")
+
+class _LazyOutput:
+    """
+    ADB命令的输出，以字节形式保存，只有真正被当作字符串使用时才解码
+    大多数调用方只关心是否成功，不读取输出，省去每次的解码开销
+    解码优先使用UTF-8，失败时按GBK(中文Windows下adb的提示信息)解码
+    """
+    __slots__ = ("data", "_text")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self._text = None
+
+    def __str__(self) -> str:
+        if self._text is None:
+            try:
+                self._text = self.data.decode('utf-8')
+            except UnicodeDecodeError:
+                self._text = self.data.decode('gbk', errors='replace')
+        return self._text
+
+    def __contains__(self, item) -> bool:
+        # ASCII子串可以直接在字节上查找，无需解码
+        if isinstance(item, str) and item.isascii():
+            return item.encode('ascii') in self.data
+        if isinstance(item, bytes):
+            return item in self.data
+        return item in str(self)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, _LazyOutput):
+            return self.data == other.data
+        if isinstance(other, bytes):
+            return self.data == other
+        return str(self) == other
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    def __bool__(self) -> bool:
+        return bool(self.data)
+
+    def __len__(self) -> int:
+        return len(str(self))
+
+    def __format__(self, spec: str) -> str:
+        return format(str(self), spec)
+
+    def __repr__(self) -> str:
+        return repr(str(self))
+
+    def __getattr__(self, name):
+        # split、strip 等字符串方法交给解码后的文本
+        return getattr(str(self), name)
+
 
 class ADBController:
-    def __init__(self, adb_path: str = "adb", device_addrs: List[str] = None):
+    def __init__(self, adb_path: str = "adb", device_addrs: List[str] = None, sendevent_tap: bool = False):
         """初始化ADB控制器"""
         self.adb_path = adb_path
         self.device_addrs = device_addrs or []
+        # 点击时直接向触摸屏写入原始事件，绕过每次都要启动的 input 程序
+        self.sendevent_tap = sendevent_tap
+        self._touch_devices = {}  # 设备ID -> (事件节点, X缩放, Y缩放, 是否有BTN_TOUCH)，不支持时为None
+        self._tracking_id = 0
         self.devices = {}  # 设备ID: {"status": "online/offline"}
         self.current_device = None  # 当前操作的设备
         self.device_id = None  # 兼容旧版
+        self._shell = None  # 持久化的 adb shell 子进程，避免每条命令都重新启动adb
+        self._shell_device = None  # 持久化shell所连接的设备
+        self._shell_lines = None  # 后台线程读取到的持久化shell输出行
+        self._shell_lock = threading.Lock()
+        self._fb_proc = None  # 持续输出原始帧缓冲的 screencap 子进程
+        self._fb_buf = None  # 复用的单帧缓冲区(头部+像素)
+        self._fb_frame = None  # 缓冲区中像素部分的数组视图
         
     def connect(self, device_id: str) -> bool:
         """连接指定设备(兼容旧版)"""
@@ -25,17 +128,68 @@ class ADBController:
         
     def connect_device(self, device_id: str) -> bool:
         """连接指定设备"""
+        if device_id != self.current_device:
+            self.stop_framebuffer_stream()  # 截图流属于之前的设备
         self.current_device = device_id
         self.device_id = device_id  # 兼容旧版
         if device_id not in self.devices:
             self.devices[device_id] = {"status": "offline"}
-        return self._check_device(device_id)
+        if not self._check_device(device_id):
+            return False
+        # 设备可用时打开(或复用)持久化shell
+        if self._shell is None or self._shell_device != device_id or self._shell.poll() is not None:
+            self._open_shell(device_id)
+        return True
+
+    def _open_shell(self, device_id: str):
+        """为指定设备启动一个常驻的 adb shell 子进程"""
+        self._close_shell()
+        try:
+            self._shell = subprocess.Popen([self.adb_path, '-s', device_id, 'shell'],
+                                           stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                           stderr=subprocess.DEVNULL, bufsize=-1)
+            self._shell_device = device_id
+            # 由后台线程读取输出，执行命令时才能按超时等待，而不是阻塞在readline上
+            self._shell_lines = queue.Queue()
+            threading.Thread(target=self._pump_shell, args=(self._shell.stdout, self._shell_lines),
+                             daemon=True).start()
+        except Exception as e:
+            print(f"启动持久化ADB shell失败，将回退到逐条执行: {e}")
+            self._shell = None
+            self._shell_device = None
+
+    @staticmethod
+    def _pump_shell(stdout, lines: queue.Queue):
+        """持续读取持久化shell的输出行，shell退出时放入None"""
+        try:
+            for line in iter(stdout.readline, b""):
+                lines.put(line)
+        except (OSError, ValueError):
+            pass
+        lines.put(None)
+
+    def close(self):
+        """关闭持久化shell和帧缓冲流"""
+        self.stop_framebuffer_stream()
+        self._close_shell()
+
+    def _close_shell(self):
+        """只关闭持久化shell，命令超时或shell失效时使用，不影响截图流"""
+        shell, self._shell, self._shell_device, self._shell_lines = self._shell, None, None, None
+        if shell is None:
+            return
+        try:
+            shell.stdin.close()
+            shell.terminate()
+            shell.wait(timeout=2)
+        except Exception:
+            shell.kill()
         
     def connect_remote_device(self, device_addr: str) -> bool:
         """连接远程/网络设备"""
         if not device_addr:
             return False
-        success, output = self._run_command(f"connect {device_addr}")
+        success, output = self._run_command(_CONNECT + (device_addr,))
         # "already connected" 也是一种成功状态
         if success or "already connected" in output:
             print(f"成功连接到 {device_addr}")
@@ -43,130 +197,435 @@ class ADBController:
         print(f"连接到 {device_addr} 失败: {output}")
         return False
 
+    async def connect_remote_device_async(self, device_addr: str) -> bool:
+        """连接远程/网络设备(异步版本)，便于在事件循环中同时连接多个设备"""
+        if not device_addr:
+            return False
+        try:
+            proc = await asyncio.create_subprocess_exec(self.adb_path, 'connect', device_addr,
+                                                        stdout=asyncio.subprocess.PIPE,
+                                                        stderr=asyncio.subprocess.PIPE)
+            stdout, stderr = await proc.communicate()
+        except FileNotFoundError:
+            print(f"连接到 {device_addr} 失败: 命令未找到，请确认ADB路径配置是否正确: '{self.adb_path}'")
+            return False
+        output = (stdout or stderr).decode('gbk', errors='replace').strip()
+        if proc.returncode == 0 or "already connected" in output:
+            print(f"成功连接到 {device_addr}")
+            return True
+        print(f"连接到 {device_addr} 失败: {output}")
+        return False
+
+    def _parallel(self, func: Callable, items: Iterable) -> list:
+        """在线程池中并行执行func，总耗时取决于最慢的一项而不是所有项之和"""
+        items = list(items)
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=len(items)) as executor:
+            return list(executor.map(func, items))
+
     def connect_all(self) -> bool:
         """连接所有配置的设备和已连接的设备"""
-        # 1. 连接在配置中指定的网络设备
-        for addr in self.device_addrs:
-            self.connect_remote_device(addr)
+        # 1. 并行连接在配置中指定的网络设备
+        self._parallel(self.connect_remote_device, self.device_addrs)
 
         # 2. 获取所有已连接设备的列表
-        success, output = self._run_command("devices")
+        success, output = self._run_command(_DEVICES)
         if not success:
             print(f"获取设备列表失败: {output}")
             return False
             
         # 解析设备列表
-        lines = output.strip().split('\n')[1:]  # 跳过第一行标题
         self.devices.clear() # 清空旧列表
-        for line in lines:
-            if not line.strip() or "List of devices" in line:
+        for line in output.splitlines()[1:]:  # 跳过第一行标题
+            if not line or line.startswith("List of devices"):
                 continue
-            parts = line.split('\t')
-            if len(parts) == 2:
-                device_id, status = parts
-                self.devices[device_id] = {"status": status}
+            device_id, sep, status = line.partition('\t')
+            if sep:
+                self.devices[device_id] = {"status": status.strip()}
         
         return len(self.devices) > 0
         
     def _check_device(self, device_id: str) -> bool:
         """检查设备是否连接"""
-        success, result = self._run_command("devices")
+        success, result = self._run_command(_DEVICES)
         if success and device_id in result:
-            self.devices[device_id]["status"] = "online"
+            # 与 adb devices 输出的状态保持一致，broadcast 等按 "device" 筛选在线设备
+            self.devices[device_id]["status"] = "device"
             return True
         self.devices[device_id]["status"] = "offline"
         return False
         
+    def broadcast(self, command: Union[str, List[str]], devices: List[str] = None) -> Dict[str, Tuple[bool, str]]:
+        """
+        在多个设备上并行执行同一条ADB命令
+        :param devices: 目标设备列表，默认为所有在线设备
+        :return: {设备ID: (是否成功, 输出或错误信息)}
+        """
+        if devices is None:
+            devices = [dev for dev, info in self.devices.items() if info.get("status") == "device"]
+        if isinstance(command, str):
+            command = command.split()
+        results = self._parallel(lambda dev: self._run_command(command, device_id=dev), devices)
+        return dict(zip(devices, results))
+
     def get_device_status(self, device_id: str) -> str:
         """获取设备状态"""
         return self.devices.get(device_id, {}).get("status", "unknown")
         
     def screenshot(self, save_path: str) -> Tuple[bool, Optional[str]]:
         """
-        获取屏幕截图
+        获取屏幕截图并保存为PNG文件
         :return: (是否成功, 错误信息或None)
         """
         if not self.current_device:
             return False, "没有选择任何设备"
-            
-        # 1. 截图到设备内部存储
-        screencap_cmd = "shell screencap -p /sdcard/screen.png"
-        success, output = self._run_command(screencap_cmd)
-        if not success:
-            return False, f"截图命令(screencap)失败: {output}"
-            
-        # 2. 从设备拉取截图到本地
-        # 使用列表传递命令，以正确处理带空格或特殊字符的路径
-        pull_cmd_list = ["pull", "/sdcard/screen.png", save_path]
-        success, output = self._run_command(pull_cmd_list)
+
+        # 通过 exec-out 直接取回PNG数据，省去先写入设备存储再pull的往返
+        success, data = self._run_binary(["exec-out", "screencap", "-p"])
         if not success:
-            return False, f"拉取截图(pull)失败: {output}"
-            
+            return False, f"截图命令(screencap)失败: {data}"
+        if not data:
+            return False, "截图命令(screencap)没有返回数据"
+
+        try:
+            with open(save_path, 'wb') as f:
+                f.write(data)
+        except OSError as e:
+            return False, f"保存截图失败: {e}"
         return True, None
+
+    def screenshot_bytes(self, raw: bool = False) -> Optional[bytes]:
+        """
+        获取屏幕截图的原始数据，不经过文件系统
+        :param raw: 为True时返回未压缩的帧缓冲数据(头部+RGBA像素)，省去PNG编解码；否则返回PNG数据
+        :return: 截图数据，失败时返回None
+        """
+        if not self.current_device:
+            print("截图失败: 没有选择任何设备")
+            return None
+        args = ["exec-out", "screencap"] if raw else ["exec-out", "screencap", "-p"]
+        success, data = self._run_binary(args)
+        if not success or not data:
+            print(f"截图命令(screencap)失败: {data}")
+            return None
+        return data
         
+    def start_framebuffer_stream(self, width: int = None, height: int = None) -> bool:
+        """
+        启动持续截图流：设备端循环执行 screencap，原始帧依次写入同一个管道
+        屏幕尺寸在一次会话中固定，因此每帧的长度已知，可以复用同一个缓冲区读取，
+        省去每帧启动adb进程、PNG编解码和分配内存的开销
+        :param width, height: 期望的屏幕尺寸，与实际不符时以实际尺寸为准
+        :return: 是否启动成功
+        """
+        self.stop_framebuffer_stream()
+        # 先截取一帧，确定屏幕尺寸和头部长度(随系统版本为12或16字节)
+        data = self.screenshot_bytes(raw=True)
+        if data is None or len(data) < 12:
+            return False
+        w, h, _ = struct.unpack_from("<3I", data)
+        header_size = len(data) - w * h * 4
+        if header_size not in (12, 16):
+            print(f"启动截图流失败: 数据长度与尺寸 {w}x{h} 不符")
+            return False
+        if (width and width != w) or (height and height != h):
+            print(f"截图流: 实际屏幕尺寸为 {w}x{h}，与期望的 {width}x{height} 不符")
+
+        cmd_list = [self.adb_path, '-s', self.current_device, 'exec-out', 'while :; do screencap; done']
+        try:
+            self._fb_proc = subprocess.Popen(cmd_list, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=0)
+        except Exception as e:
+            print(f"启动截图流失败: {e}")
+            return False
+        self._fb_buf = bytearray(header_size + w * h * 4)
+        self._fb_frame = np.frombuffer(self._fb_buf, np.uint8, count=w * h * 4, offset=header_size).reshape(h, w, 4)
+        return True
+
+    def next_frame(self, fresh: bool = False) -> Optional[np.ndarray]:
+        """
+        从截图流读取下一帧
+        返回的是RGBA数组视图，每次调用都返回同一个数组，内容被新的一帧覆盖；需要保留时请自行复制
+        设备端在管道写满时阻塞，读到的帧可能是上次读取后不久截取的旧画面
+        :param fresh: 为True时先丢弃这一帧，返回在本次调用之后才开始截取的一帧
+        :return: (高, 宽, 4) 的数组，截图流未启动或已断开时返回None
+        """
+        if fresh and self.next_frame() is None:
+            return None
+        proc = self._fb_proc
+        if proc is None:
+            return None
+        view = memoryview(self._fb_buf)
+        filled = 0
+        while filled < len(view):
+            n = proc.stdout.readinto(view[filled:])
+            if not n:
+                print("截图流已断开")
+                self.stop_framebuffer_stream()
+                return None
+            filled += n
+        return self._fb_frame
+
+    def stop_framebuffer_stream(self):
+        """停止截图流"""
+        proc, self._fb_proc = self._fb_proc, None
+        self._fb_buf = self._fb_frame = None
+        if proc is None:
+            return
+        try:
+            proc.kill()
+            proc.wait(timeout=2)
+        except Exception:
+            pass
+
     def tap(self, x: int, y: int) -> Tuple[bool, Optional[str]]:
         """模拟点击操作"""
-        cmd = f"shell input tap {x} {y}"
-        return self._run_command(cmd)
+        if self.sendevent_tap:
+            script = self._sendevent_tap_script(x, y)
+            if script is not None:
+                return self._run_command(("shell", script), timeout=_INPUT_TIMEOUT)
+        return self._run_command(_TAP + (x, y), timeout=_INPUT_TIMEOUT)
+
+    def _touch_device(self):
+        """
+        查找当前设备的触摸屏事件节点，每个设备只探测一次
+        通过 getevent -pl 找到带 ABS_MT_POSITION_X/Y 的设备，并按 wm size 计算坐标缩放比例；
+        未跟踪屏幕旋转，假定触摸坐标轴的横竖方向与屏幕一致
+        :return: (事件节点, X缩放, Y缩放, 是否有BTN_TOUCH)，不支持时返回None
+        """
+        device = self.current_device
+        if device in self._touch_devices:
+            return self._touch_devices[device]
+
+        touch = None
+        success, output = self._run_command(_GETEVENT_PROBE)
+        size_ok, size_output = self._run_command(_WM_SIZE)
+        sizes = _SIZE_RE.findall(str(size_output)) if size_ok else []
+        if success and sizes:
+            node, axes, has_btn = None, {}, False
+            for line in str(output).splitlines() + ["add device"]:
+                if line.startswith("add device"):
+                    if node and "x" in axes and "y" in axes:
+                        break
+                    node, axes, has_btn = line.partition(":")[2].strip() or None, {}, False
+                elif "BTN_TOUCH" in line:
+                    has_btn = True
+                elif "ABS_MT_POSITION_X" in line or "ABS_MT_POSITION_Y" in line:
+                    found = _AXIS_MAX_RE.search(line)
+                    if found:
+                        axes["x" if "POSITION_X" in line else "y"] = int(found.group(1)) + 1
+            if node and "x" in axes and "y" in axes:
+                # 优先使用覆盖后的分辨率(wm size 输出的最后一项)
+                width, height = map(int, sizes[-1])
+                if (axes["x"] > axes["y"]) != (width > height):
+                    width, height = height, width
+                touch = (node, axes["x"] / width, axes["y"] / height, has_btn)
+
+        if touch is None:
+            print(f"设备 {device} 未找到可用的触摸屏事件节点，点击将使用 input tap")
+        self._touch_devices[device] = touch
+        return touch
+
+    def _sendevent_tap_script(self, x: int, y: int) -> Optional[str]:
+        """生成一次点击(按下再抬起)的 sendevent 命令序列，整体作为一条shell命令写入"""
+        touch = self._touch_device()
+        if touch is None:
+            return None
+        node, scale_x, scale_y, has_btn = touch
+        self._tracking_id = (self._tracking_id + 1) % 65535
+        events = [(_EV_ABS, _ABS_MT_SLOT, 0),
+                  (_EV_ABS, _ABS_MT_TRACKING_ID, self._tracking_id),
+                  (_EV_ABS, _ABS_MT_POSITION_X, round(x * scale_x)),
+                  (_EV_ABS, _ABS_MT_POSITION_Y, round(y * scale_y))]
+        if has_btn:
+            events.append((_EV_KEY, _BTN_TOUCH, 1))
+        events += [(_EV_SYN, 0, 0), (_EV_ABS, _ABS_MT_TRACKING_ID, -1)]
+        if has_btn:
+            events.append((_EV_KEY, _BTN_TOUCH, 0))
+        events.append((_EV_SYN, 0, 0))
+        return "{ " + "; ".join(f"sendevent {node} {t} {c} {v}" for t, c, v in events) + "; }"
         
     def swipe(self, x1: int, y1: int, x2: int, y2: int, duration: int = 300) -> Tuple[bool, Optional[str]]:
         """模拟滑动操作"""
-        cmd = f"shell input swipe {x1} {y1} {x2} {y2} {duration}"
-        return self._run_command(cmd)
+        return self._run_command(_SWIPE + (x1, y1, x2, y2, duration), timeout=_INPUT_TIMEOUT + duration / 1000)
 
     def long_press(self, x: int, y: int, duration: int = 1000) -> Tuple[bool, Optional[str]]:
         """模拟长按操作，通过起始点和终点相同的swipe实现"""
-        cmd = f"shell input swipe {x} {y} {x} {y} {duration}"
-        return self._run_command(cmd)
+        return self._run_command(_SWIPE + (x, y, x, y, duration), timeout=_INPUT_TIMEOUT + duration / 1000)
+
+    def batch_input(self, ops: List[Tuple]) -> Tuple[bool, Optional[str], int]:
+        """
+        将多个输入操作合并为一条shell命令执行，省去逐条调用adb的开销
+        :param ops: 操作列表，支持 ("tap", x, y)、("swipe", x1, y1, x2, y2, duration)、
+                    ("long_press", x, y, duration) 和 ("sleep", 秒)
+        :return: (是否成功, 错误信息或None, 已确认执行完成的输入操作数(不含sleep))
+        """
+        commands = []  # (命令, 该命令的超时)
+        for op in ops:
+            kind = op[0]
+            if kind == "tap":
+                script = self._sendevent_tap_script(op[1], op[2]) if self.sendevent_tap else None
+                commands.append((script or f"input tap {op[1]} {op[2]}", _INPUT_TIMEOUT))
+            elif kind == "swipe":
+                duration = op[5] if len(op) > 5 else 300
+                commands.append(("input swipe " + " ".join(str(v) for v in op[1:]),
+                                 _INPUT_TIMEOUT + duration / 1000))
+            elif kind == "long_press":
+                x, y = op[1], op[2]
+                duration = op[3] if len(op) > 3 else 1000
+                commands.append((f"input swipe {x} {y} {x} {y} {duration}", _INPUT_TIMEOUT + duration / 1000))
+            elif kind == "sleep":
+                commands.append((f"sleep {op[1]}", float(op[1])))
+            else:
+                return False, f"未知的输入操作: {kind}", 0
+            if kind != "sleep":
+                # 输入操作成功后输出标记行
+                commands[-1] = (f"{commands[-1][0]} && echo {_BATCH_OP_DONE}", commands[-1][1])
+
+        # 按长度上限分段，用 && 连接以便在某个操作失败时停止后续操作
+        chunks, chunk, size, timeout = [], [], 0, 0.0
+        for cmd, cmd_timeout in commands:
+            if chunk and size + len(cmd) > _BATCH_PAYLOAD_LIMIT:
+                chunks.append((chunk, timeout))
+                chunk, size, timeout = [], 0, 0.0
+            chunk.append(cmd)
+            size += len(cmd) + 4
+            timeout += cmd_timeout
+        if chunk:
+            chunks.append((chunk, timeout))
+
+        done = 0
+        for chunk, timeout in chunks:
+            success, output = self._run_command(["shell", " && ".join(chunk)], timeout=timeout)
+            # 失败时输出中同样保留了已完成操作的标记行(包括超时前已经读到的部分)
+            done += sum(1 for line in str(output).splitlines() if line.strip() == _BATCH_OP_DONE)
+            if not success:
+                return False, output, done
+        return True, None, done
 
     def restart_app(self, package_name: str) -> Tuple[bool, Optional[str]]:
         """强制停止并重启一个应用"""
         # 1. 强制停止应用
-        stop_cmd = f"shell am force-stop {package_name}"
-        success, output = self._run_command(stop_cmd)
+        success, output = self._run_command(_FORCE_STOP + (package_name,))
         if not success:
             # force-stop 在应用未运行时可能会失败，但这不应视为致命错误
             print(f"警告: 强制停止应用 '{package_name}' 可能失败 (这在应用未运行时是正常的): {output}")
 
         # 2. 启动应用的主活动
         # 使用 'monkey' 来启动应用，因为它通常能找到默认的启动Activity
-        start_cmd = f"shell monkey -p {package_name} -c android.intent.category.LAUNCHER 1"
-        success, output = self._run_command(start_cmd)
+        success, output = self._run_command(_MONKEY + (package_name, "-c", "android.intent.category.LAUNCHER", "1"))
         if not success:
             return False, f"启动应用 '{package_name}' 失败: {output}"
         
         return True, None
         
-    def _run_command(self, command: Union[str, List[str]], device_id: str = None) -> Tuple[bool, str]:
+    def _run_command(self, command: Sequence, device_id: str = None,
+                     timeout: float = _DEFAULT_TIMEOUT) -> Tuple[bool, str]:
         """
         执行ADB命令
-        :param command: 可以是单个字符串或参数列表
-        :return: (是否成功, 输出或错误信息)
+        :param command: 参数序列，非字符串的参数(如坐标)会自动转换为字符串
+        :param timeout: 超时秒数，超时后结束命令并返回失败
+        :return: (是否成功, 输出或错误信息)，输出在首次作为字符串使用时才解码
         """
         target_device = device_id or self.current_device
+
+        # shell 命令优先通过持久化shell执行，省去每次启动adb进程的开销
+        args = list(map(str, command))
+        if args and args[0] == "shell" and len(args) > 1 and target_device == self._shell_device:
+            result = self._run_in_shell(" ".join(args[1:]), timeout)
+            if result is not None:
+                return result
+
         cmd_list = [self.adb_path]
         if target_device:
             cmd_list.extend(["-s", target_device])
         
-        if isinstance(command, str):
-            cmd_list.extend(command.split())
-        else: # 如果是列表，直接扩展
-            cmd_list.extend(command)
+        cmd_list.extend(args)
 
         try:
-            result = subprocess.run(cmd_list, shell=False, check=True,
-                                 capture_output=True, text=True,
-                                 encoding='gbk', errors='replace')
-            return True, result.stdout.strip()
+            result = subprocess.run(cmd_list, shell=False, check=True, capture_output=True, timeout=timeout)
+            return True, _LazyOutput(result.stdout.strip())
+        except subprocess.TimeoutExpired as e:
+            # subprocess.run 在超时时会先结束子进程再抛出异常
+            error_msg = f"命令执行超时({timeout:g}秒): {' '.join(args)}"
+            if e.stdout:  # 附上超时前已有的输出
+                error_msg += "\n" + e.stdout.decode('utf-8', 'replace').strip()
+            print(f"ADB命令执行失败: {error_msg}")
+            return False, error_msg
         except FileNotFoundError:
             error_msg = f"命令未找到，请确认ADB路径配置是否正确: '{self.adb_path}'"
             print(f"ADB命令执行失败: {error_msg}")
             return False, error_msg
         except subprocess.CalledProcessError as e:
-            error_msg = e.stderr.strip()
+            error_msg = _LazyOutput((e.stdout + e.stderr).strip() if e.stdout else e.stderr.strip())
             print(f"ADB命令执行失败: {error_msg}")
             return False, error_msg
         except Exception as e:
             error_msg = str(e)
             print(f"执行ADB时发生未知错误: {error_msg}")
             return False, error_msg
+
+    def _run_in_shell(self, command: str, timeout: float = _DEFAULT_TIMEOUT) -> Optional[Tuple[bool, str]]:
+        """
+        在持久化shell中执行命令，读取到哨兵行为止
+        超时后关闭shell并返回失败(不回退重试，避免输入操作被重复执行)
+        :return: (是否成功, 输出)；shell不可用时返回None，由调用方回退到逐条执行
+        """
+        with self._shell_lock:
+            shell, lines = self._shell, self._shell_lines
+            if shell is None or shell.poll() is not None:
+                return None
+            deadline = time.monotonic() + timeout
+            try:
+                shell.stdin.write(b"{ " + command.encode('utf-8') + b"; } 2>&1; echo " + _SHELL_SENTINEL + b"$?\n")
+                shell.stdin.flush()
+                output = []
+                while True:
+                    try:
+                        line = lines.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        self._close_shell()
+                        error_msg = f"命令执行超时({timeout:g}秒): {command}"
+                        partial = b"".join(output).strip()
+                        if partial:  # 附上超时前已有的输出
+                            error_msg += "\n" + partial.decode('utf-8', 'replace')
+                        print(f"ADB命令执行失败: {error_msg}")
+                        return False, error_msg
+                    if not line:  # shell已退出(例如设备断开)
+                        raise EOFError("持久化shell意外退出")
+                    head, sentinel, code = line.rpartition(_SHELL_SENTINEL)
+                    if sentinel:
+                        output.append(head)
+                        break
+                    output.append(line)
+            except Exception as e:
+                print(f"持久化ADB shell失效，将回退到逐条执行: {e}")
+                self._close_shell()
+                return None
+
+        text = _LazyOutput(b"".join(output).strip())
+        if code.strip() == b"0":
+            return True, text
+        print(f"ADB命令执行失败: {text}")
+        return False, text
+
+    def _run_binary(self, command: List[str]) -> Tuple[bool, Union[bytes, str]]:
+        """
+        执行ADB命令并以字节形式返回标准输出，用于截图等二进制数据
+        :return: (是否成功, 输出字节或错误信息)
+        """
+        cmd_list = [self.adb_path]
+        if self.current_device:
+            cmd_list.extend(["-s", self.current_device])
+        cmd_list.extend(command)
+        try:
+            result = subprocess.run(cmd_list, shell=False, check=True, capture_output=True, timeout=_TRANSFER_TIMEOUT)
+            return True, result.stdout
+        except subprocess.TimeoutExpired:
+            return False, f"命令执行超时({_TRANSFER_TIMEOUT:g}秒): {' '.join(command)}"
+        except FileNotFoundError:
+            return False, f"命令未找到，请确认ADB路径配置是否正确: '{self.adb_path}'"
+        except subprocess.CalledProcessError as e:
+            return False, e.stderr.decode('utf-8', errors='replace').strip()
+        except Exception as e:
+            return False, str(e)
@@ -8,139 +8,623 @@
 
 import cv2
 import numpy as np
-from PIL import Image
-from typing import Optional, Tuple
+from typing import Optional, Tuple, List, Hashable
 
 import os
+import struct
+import hashlib
+import threading
+from functools import lru_cache
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+
+# OCR为可选功能，未安装pytesseract时相关方法直接返回
+try:
+    import pytesseract
+    from pytesseract import image_to_string, image_to_data, Output
+    _HAS_PYTESSERACT = True
+except ImportError:
+    _HAS_PYTESSERACT = False
+
+# 可选的 tesserocr 直接调用libtesseract，省去每次启动tesseract进程和写临时图片文件
+try:
+    import tesserocr
+    _HAS_TESSEROCR = True
+except ImportError:
+    _HAS_TESSEROCR = False
+
+_HAS_OCR = _HAS_PYTESSERACT or _HAS_TESSEROCR
+_OCR_DATA_FIELDS = ('level', 'text', 'conf', 'left', 'top', 'width', 'height')
+_NO_OCR_MSG = "未安装pytesseract，无法进行OCR识别"
+
+_PNG_MAGIC = b"\x89PNG"
+# screencap 原始帧缓冲的像素格式: 1=RGBA_8888, 2=RGBX_8888
+_RAW_RGBA_FORMATS = (1, 2)
+# 缓存的模板图像数量上限
+_TEMPLATE_CACHE_SIZE = 64
+# 缓存的匹配结果数量上限
+_MATCH_CACHE_SIZE = 32
+# 缩小截图后模板短边不能小于该值，否则不缩小，以免影响匹配准确度
+_MIN_SCALED_TEMPLATE = 16
+# 源图像素数和模板短边都达到该值时，先在半分辨率上粗匹配，再在原图的小区域内精确定位
+_PYRAMID_MIN_SOURCE = 1280 * 720
+_PYRAMID_MIN_TEMPLATE = 48
+# 精确定位时在粗匹配位置周围多取的像素
+_PYRAMID_PAD = 8
+# 复用的匹配结果缓冲区数量上限(按尺寸区分)
+_RESULT_BUFFER_COUNT = 8
+# 缓存的OCR结果数量上限
+_OCR_CACHE_SIZE = 8
+# 超过该高度的图像在OCR前缩小到 _OCR_TARGET_HEIGHT
+_OCR_MAX_HEIGHT = 2000
+_OCR_TARGET_HEIGHT = 1000
+# 均方误差超过该值(约每像素相差30)时认为图像明显不同，跳过SSIM计算
+_SSIM_MSE_CUTOFF = 30 ** 2
+# SSIM 公式中的稳定常数 (K1*L)^2, (K2*L)^2，L=255
+_SSIM_C1 = (0.01 * 255) ** 2
+_SSIM_C2 = (0.03 * 255) ** 2
+# 缓存的彩色图像数量上限
+_IMAGE_CACHE_SIZE = 128
+
+
+@lru_cache(maxsize=_IMAGE_CACHE_SIZE)
+def _load_image_cached(image_path: str, mtime: float) -> Optional[np.ndarray]:
+    """
+    读取并解码彩色图像(RGB)，按(路径, 修改时间)缓存，文件被修改后自动重新读取
+    返回的数组在调用之间共享，设为只读以防被意外修改
+    """
+    # 用 imdecode 读取，兼容包含中文的路径
+    img = cv2.imdecode(np.fromfile(image_path, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    img.setflags(write=False)
+    return img
+
 
 class ImageProcessor:
-    def __init__(self, threshold: float = 0.8, base_dir: str = None, tesseract_path: str = None):
+    def __init__(self, threshold: float = 0.8, base_dir: str = None, tesseract_path: str = None,
+                 match_max_dim: int = 1280, ocr_max_dim: int = 1280):
         """初始化图像处理器"""
         self.threshold = threshold  # 模板匹配阈值
+        # 截图长边超过该值时先缩小再做模板匹配/OCR，坐标再换算回原图；为0时不缩小
+        self.match_max_dim = match_max_dim
+        self.ocr_max_dim = ocr_max_dim
         self.base_dir = base_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.tesseract_path = tesseract_path
+        self._template_cache = OrderedDict()  # (路径, 修改时间) -> 灰度模板
+        self._hit_counts = {}  # 模板标识 -> 在 find_any_template 中的命中次数
+        self._match_cache = OrderedDict()  # (源图指纹, id(模板), 缩放比例) -> (模板, 最大相似度, 位置)
+        self._scaled_templates = OrderedDict()  # (id(模板), 缩放比例) -> (模板, 缩小后的模板)
+        self._res_bufs = {}  # 结果尺寸 -> 复用的 matchTemplate 输出缓冲区
+        self._ocr_cache = OrderedDict()  # (类型, 图像哈希, 语言) -> OCR结果
+        self._ocr_pending = {}  # 正在后台预识别的缓存键 -> Future
+        self._ocr_lock = threading.Lock()
+        self._prefetch_pool = None  # 预识别线程池，首次使用时创建
+        self._tess_apis = {}  # 语言 -> 常驻的 tesserocr 实例(初始化失败时为None)
+        self._tess_lock = threading.Lock()  # tesserocr 实例不支持多线程同时使用
+        self._gray_cache = OrderedDict()  # id(图像) -> (图像, 灰度图)，供图像比较重复使用
         self._configure_tesseract()
         
     def _configure_tesseract(self):
         """如果配置了路径，则设置pytesseract的路径"""
-        if self.tesseract_path and os.path.exists(self.tesseract_path):
-            try:
-                import pytesseract
-                pytesseract.pytesseract.tesseract_cmd = self.tesseract_path
-            except ImportError:
-                pass # 如果没有安装，后续调用会处理
+        if _HAS_PYTESSERACT and self.tesseract_path and os.path.exists(self.tesseract_path):
+            pytesseract.pytesseract.tesseract_cmd = self.tesseract_path
         
     def load_image(self, image_path: str) -> Optional[np.ndarray]:
-        """加载图像文件，支持相对和绝对路径"""
+        """
+        加载图像文件，支持相对和绝对路径
+        解码结果会被缓存并共享，返回的数组为只读，需要修改时请先 copy()
+        """
         try:
             # 如果不是绝对路径，则与基准目录拼接
             if not os.path.isabs(image_path):
                 image_path = os.path.join(self.base_dir, image_path)
-            
-            img = cv2.imread(image_path, cv2.IMREAD_COLOR)
+            if not os.path.exists(image_path):
+                print(f"图像加载失败: 文件不存在或格式不支持 at {image_path}")
+                return None
+
+            img = _load_image_cached(image_path, os.path.getmtime(image_path))
             if img is None:
                 print(f"图像加载失败: 文件不存在或格式不支持 at {image_path}")
                 return None
-            return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            return img
         except Exception as e:
             print(f"图像加载失败: {e}")
             return None
             
+    def load_template(self, image_path: str) -> Optional[np.ndarray]:
+        """
+        加载用于模板匹配的灰度图像
+        按(路径, 修改时间)缓存，模板文件未变化时不再重复读取和解码
+        """
+        if not os.path.isabs(image_path):
+            image_path = os.path.join(self.base_dir, image_path)
+        try:
+            key = (image_path, os.path.getmtime(image_path))
+        except OSError:
+            print(f"模板加载失败: 文件不存在 at {image_path}")
+            return None
+
+        template = self._template_cache.get(key)
+        if template is not None:
+            self._template_cache.move_to_end(key)
+            return template
+
+        try:
+            # 用 imdecode 读取，兼容包含中文的路径
+            template = cv2.imdecode(np.fromfile(image_path, np.uint8), cv2.IMREAD_GRAYSCALE)
+        except Exception as e:
+            print(f"模板加载失败: {e}")
+            return None
+        if template is None:
+            print(f"模板加载失败: 格式不支持 at {image_path}")
+            return None
+
+        self._template_cache[key] = template
+        if len(self._template_cache) > _TEMPLATE_CACHE_SIZE:
+            self._template_cache.popitem(last=False)
+        return template
+
+    @staticmethod
+    def _to_gray(img: np.ndarray) -> np.ndarray:
+        """转换为单通道灰度图，已是灰度图时直接返回"""
+        if img.ndim == 2:
+            return img
+        code = cv2.COLOR_RGBA2GRAY if img.shape[2] == 4 else cv2.COLOR_RGB2GRAY
+        return cv2.cvtColor(img, code)
+
+    def decode_bytes(self, data: bytes) -> Optional[np.ndarray]:
+        """
+        将截图数据直接解码为RGB图像，支持PNG数据和 screencap 的原始帧缓冲数据
+        """
+        if not data:
+            return None
+        try:
+            if data.startswith(_PNG_MAGIC):
+                img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+                if img is None:
+                    print("截图解码失败: PNG数据无效")
+                    return None
+                return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            return self._decode_raw(data)
+        except Exception as e:
+            print(f"截图解码失败: {e}")
+            return None
+
+    def _decode_raw(self, data: bytes) -> Optional[np.ndarray]:
+        """解析 screencap 原始输出: 宽、高、格式(安卓9以上还有色彩空间)组成的头部，后接RGBA像素"""
+        width, height, fmt = struct.unpack_from("<3I", data)
+        if fmt not in _RAW_RGBA_FORMATS:
+            print(f"截图解码失败: 不支持的像素格式 {fmt}")
+            return None
+        # 头部长度随系统版本为12或16字节，由总长度反推
+        header_size = len(data) - width * height * 4
+        if header_size not in (12, 16):
+            print(f"截图解码失败: 数据长度与尺寸 {width}x{height} 不符")
+            return None
+        # 直接在原始数据上建立视图，不复制像素
+        rgba = np.frombuffer(data, np.uint8, count=width * height * 4, offset=header_size).reshape(height, width, 4)
+        return cv2.cvtColor(rgba, cv2.COLOR_RGBA2RGB)
+
+    @staticmethod
+    def _fingerprint(gray_src: np.ndarray) -> bytes:
+        """
+        对完整像素数据计算哈希，作为截图内容的指纹
+        缩略图会漏掉按钮变灰、小图标出现等细小变化，导致轮询一直命中旧的缓存结果
+        """
+        return hashlib.blake2b(np.ascontiguousarray(gray_src).data, digest_size=16).digest() \
+            + bytes(str(gray_src.shape), "ascii")
+
+    def invalidate(self):
+        """清空匹配结果缓存，在点击、滑动等会改变画面的操作之后调用"""
+        self._match_cache.clear()
+
+    def _result_buffer(self, src_shape: Tuple[int, ...], tpl_shape: Tuple[int, ...]) -> np.ndarray:
+        """获取与结果尺寸一致的输出缓冲区，同尺寸的重复匹配不再每次分配"""
+        shape = (src_shape[0] - tpl_shape[0] + 1, src_shape[1] - tpl_shape[1] + 1)
+        buf = self._res_bufs.get(shape)
+        if buf is None:
+            if len(self._res_bufs) >= _RESULT_BUFFER_COUNT:
+                self._res_bufs.clear()
+            buf = self._res_bufs[shape] = np.empty(shape, np.float32)
+        return buf
+
+    def _match_max(self, gray_src: np.ndarray, gray_tpl: np.ndarray) -> Tuple[float, Tuple[int, int]]:
+        """执行一次模板匹配，返回最大相似度及其左上角位置"""
+        res = cv2.matchTemplate(gray_src, gray_tpl, cv2.TM_CCOEFF_NORMED,
+                                result=self._result_buffer(gray_src.shape, gray_tpl.shape))
+        _, max_val, _, max_loc = cv2.minMaxLoc(res)
+        return max_val, max_loc
+
+    def _locate(self, gray_src: np.ndarray, gray_tpl: np.ndarray,
+                pyramid: bool = True) -> Tuple[float, Tuple[int, int]]:
+        """
+        查找模板的最佳匹配位置
+        源图和模板都较大时使用两级金字塔: 先把两者缩小一半粗匹配(计算量约为原来的1/16)，
+        粗匹配结果接近阈值时，再在原图对应位置附近的小区域内按原分辨率精确匹配
+        :param pyramid: 截图已经按 match_max_dim 缩小过时为False，不再缩小一半粗匹配
+        """
+        h, w = gray_tpl.shape[:2]
+        if not pyramid or gray_src.size < _PYRAMID_MIN_SOURCE or min(h, w) < _PYRAMID_MIN_TEMPLATE:
+            return self._match_max(gray_src, gray_tpl)
+
+        small_src = cv2.resize(gray_src, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+        small_tpl = cv2.resize(gray_tpl, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+        coarse_val, (sx, sy) = self._match_max(small_src, small_tpl)
+        if coarse_val < self.threshold - 0.1:
+            return coarse_val, (sx * 2, sy * 2)  # 粗匹配已明显不足，不再精确匹配
+
+        x0 = max(0, sx * 2 - _PYRAMID_PAD)
+        y0 = max(0, sy * 2 - _PYRAMID_PAD)
+        roi = gray_src[y0:sy * 2 + h + _PYRAMID_PAD, x0:sx * 2 + w + _PYRAMID_PAD]
+        if roi.shape[0] < h or roi.shape[1] < w:
+            return self._match_max(gray_src, gray_tpl)
+        max_val, (x, y) = self._match_max(roi, gray_tpl)
+        return max_val, (x0 + x, y0 + y)
+
+    def _match_scale(self, src_shape: Tuple[int, ...], tpl_shapes: List[Tuple[int, ...]]) -> float:
+        """计算匹配前截图的缩小比例；缩小后有模板过小时不缩小"""
+        longest = max(src_shape[:2])
+        if not self.match_max_dim or longest <= self.match_max_dim:
+            return 1.0
+        scale = self.match_max_dim / longest
+        if any(min(shape[:2]) * scale < _MIN_SCALED_TEMPLATE for shape in tpl_shapes):
+            return 1.0
+        return scale
+
+    def _scale_source(self, gray_src: np.ndarray, scale: float) -> np.ndarray:
+        """按比例缩小截图"""
+        if scale == 1.0:
+            return gray_src
+        return cv2.resize(gray_src, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    def _scaled_template(self, gray_tpl: np.ndarray, scale: float) -> np.ndarray:
+        """按与截图相同的比例缩小模板，结果按模板对象缓存"""
+        key = (id(gray_tpl), scale)
+        cached = self._scaled_templates.get(key)
+        if cached is not None and cached[0] is gray_tpl:
+            return cached[1]
+        scaled = cv2.resize(gray_tpl, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        self._scaled_templates[key] = (gray_tpl, scaled)
+        if len(self._scaled_templates) > _TEMPLATE_CACHE_SIZE:
+            self._scaled_templates.popitem(last=False)
+        return scaled
+
+    def _match_gray(self, gray_src: np.ndarray, gray_tpl: np.ndarray, src_key: bytes = None,
+                    scale: float = 1.0) -> Optional[Tuple[int, int]]:
+        """
+        在灰度图上匹配单个模板，返回中心坐标或None
+        gray_src 为已按 scale 缩小的截图，模板按同样比例缩小，返回的坐标换算回原图
+        提供源图指纹时，画面未变化的重复匹配直接使用缓存结果
+        """
+        tpl = gray_tpl if scale == 1.0 else self._scaled_template(gray_tpl, scale)
+        h, w = tpl.shape[:2]
+        if h > gray_src.shape[0] or w > gray_src.shape[1]:
+            return None  # 模板比源图大，不可能匹配
+        key = (src_key, id(gray_tpl), scale)
+        cached = self._match_cache.get(key) if src_key is not None else None
+        # 同时保存模板本身，防止模板被回收后id被复用
+        if cached is not None and cached[0] is gray_tpl:
+            self._match_cache.move_to_end(key)
+            _, max_val, max_loc = cached
+        else:
+            # 已经缩小过的截图再减半粗匹配，容易在精确匹配之前就漏掉目标
+            max_val, max_loc = self._locate(gray_src, tpl, pyramid=(scale == 1.0))
+            # 只缓存命中结果，未命中时每次都重新匹配，避免等待目标出现时反复读到旧结果
+            if src_key is not None and max_val >= self.threshold:
+                self._match_cache[key] = (gray_tpl, max_val, max_loc)
+                if len(self._match_cache) > _MATCH_CACHE_SIZE:
+                    self._match_cache.popitem(last=False)
+        # 缓存原始相似度，调高阈值后仍然生效
+        if max_val >= self.threshold:
+            return (round((max_loc[0] + w // 2) / scale), round((max_loc[1] + h // 2) / scale))
+        return None
+
     def find_template(self, source_img: np.ndarray, template_img: np.ndarray) -> Optional[Tuple[int, int]]:
         """
         模板匹配查找目标位置
+        在灰度图上匹配，计算量和内存带宽只有三通道匹配的三分之一；
+        截图较大时先缩小到 match_max_dim 再匹配
         返回匹配位置的(x,y)坐标
         """
         try:
-            res = cv2.matchTemplate(source_img, template_img, cv2.TM_CCOEFF_NORMED)
-            _, max_val, _, max_loc = cv2.minMaxLoc(res)
-            
-            if max_val >= self.threshold:
-                h, w = template_img.shape[:2]
-                center_x = max_loc[0] + w // 2
-                center_y = max_loc[1] + h // 2
-                return (center_x, center_y)
+            gray_tpl = self._to_gray(template_img)
+            gray_src = self._to_gray(source_img)
+            scale = self._match_scale(gray_src.shape, [gray_tpl.shape])
+            gray_src = self._scale_source(gray_src, scale)
+            return self._match_gray(gray_src, gray_tpl, self._fingerprint(gray_src), scale)
+        except Exception as e:
+            print(f"模板匹配失败: {e}")
+            return None
+
+    def find_any_template(self, source_img: np.ndarray, templates: List[np.ndarray],
+                          keys: Optional[List[Hashable]] = None) -> Optional[Tuple[int, int, int]]:
+        """
+        在同一张截图上依次匹配多个模板，找到第一个超过阈值的即停止
+        源图只转换一次灰度。提供keys(如模板路径)时按历史命中次数排序，最常命中的模板最先匹配；
+        不提供时按传入顺序匹配
+        :return: (模板下标, x, y) 或 None
+        """
+        try:
+            gray_tpls = [None if tpl is None else self._to_gray(tpl) for tpl in templates]
+            gray_src = self._to_gray(source_img)
+            scale = self._match_scale(gray_src.shape, [tpl.shape for tpl in gray_tpls if tpl is not None])
+            gray_src = self._scale_source(gray_src, scale)
+            src_key = self._fingerprint(gray_src)
+            order = range(len(templates))
+            if keys is not None:
+                order = sorted(order, key=lambda i: -self._hit_counts.get(keys[i], 0))
+            for i in order:
+                if gray_tpls[i] is None:
+                    continue
+                pos = self._match_gray(gray_src, gray_tpls[i], src_key, scale)
+                if pos is not None:
+                    if keys is not None:
+                        self._hit_counts[keys[i]] = self._hit_counts.get(keys[i], 0) + 1
+                    return (i, pos[0], pos[1])
             return None
         except Exception as e:
             print(f"模板匹配失败: {e}")
             return None
             
-    def extract_text(self, image: np.ndarray, lang: str = 'chi_sim+eng') -> Optional[str]:
+    def _prepare_ocr_image(self, image: np.ndarray) -> Tuple[np.ndarray, float]:
+        """
+        OCR前的预处理: 灰度化、过大时缩小、Otsu二值化
+        Tesseract在干净的二值图上更快也更准确
+        :return: (二值图, 缩放比例)
+        """
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        height, width = gray.shape
+        scale = 1.0
+        if self.ocr_max_dim and max(height, width) > self.ocr_max_dim:
+            scale = self.ocr_max_dim / max(height, width)
+        elif height > _OCR_MAX_HEIGHT:
+            scale = _OCR_TARGET_HEIGHT / height
+        if scale != 1.0:
+            gray = cv2.resize(gray, (max(1, round(width * scale)), max(1, round(height * scale))),
+                              interpolation=cv2.INTER_AREA)
+        _, bw = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return bw, scale
+
+    def _ocr_key(self, image: np.ndarray, lang: str, kind: str, psm: Optional[int]) -> tuple:
+        """OCR结果的缓存键"""
+        # 对完整像素数据计算哈希，避免缩略图漏掉细小的文字变化；哈希耗时远小于一次OCR
+        digest = hashlib.blake2b(np.ascontiguousarray(image).data, digest_size=16).digest()
+        return (kind, digest, image.shape, lang, psm, self.ocr_max_dim)
+
+    def _ocr(self, image: np.ndarray, lang: str, kind: str = "data", psm: Optional[int] = None):
+        """
+        调用Tesseract识别图像，同一张图像的结果会被缓存
+        kind 为 "data" 时返回 image_to_data 的字典(坐标已换算回原图)，为 "string" 时返回 image_to_string 的文本
+        psm 为Tesseract的页面分割模式，如已知是单一文本块可传6跳过版面分析
+        """
+        key = self._ocr_key(image, lang, kind, psm)
+        with self._ocr_lock:
+            result = self._ocr_cache.get(key)
+            if result is not None:
+                self._ocr_cache.move_to_end(key)
+                return result
+            future = self._ocr_pending.get(key)
+        if future is not None:
+            return future.result()  # 同一图像正在后台预识别，等待其结果
+        return self._run_ocr(key, image, lang, kind, psm)
+
+    def _run_ocr(self, key: tuple, image: np.ndarray, lang: str, kind: str, psm: Optional[int]):
+        """执行识别并写入缓存"""
+        bw, scale = self._prepare_ocr_image(image)
+        api = self._tess_api(lang)
+        if api is not None:
+            result = self._run_tesserocr(api, bw, kind, psm)
+        elif not _HAS_PYTESSERACT:
+            raise RuntimeError("tesserocr不可用且未安装pytesseract")
+        else:
+            # pytesseract 可以直接接收数组，无需先转换为PIL图像
+            config = f"--psm {int(psm)}" if psm else ""
+            if kind == "string":
+                result = image_to_string(bw, lang=lang, config=config)
+            else:
+                result = image_to_data(bw, lang=lang, config=config, output_type=Output.DICT)
+        if kind != "string" and scale != 1.0:
+            for field in ('left', 'top', 'width', 'height'):
+                result[field] = [round(v / scale) for v in result[field]]
+
+        with self._ocr_lock:
+            self._ocr_cache[key] = result
+            if len(self._ocr_cache) > _OCR_CACHE_SIZE:
+                self._ocr_cache.popitem(last=False)
+        return result
+
+    def _tess_api(self, lang: str):
+        """获取指定语言的常驻 tesserocr 实例，不可用时返回None，改用pytesseract"""
+        if not _HAS_TESSEROCR:
+            return None
+        with self._tess_lock:
+            if lang not in self._tess_apis:
+                try:
+                    self._tess_apis[lang] = tesserocr.PyTessBaseAPI(lang=lang)
+                except RuntimeError as e:
+                    print(f"tesserocr初始化失败，改用pytesseract: {e}")
+                    self._tess_apis[lang] = None
+            return self._tess_apis[lang]
+
+    def _run_tesserocr(self, api, bw: np.ndarray, kind: str, psm: Optional[int]):
+        """用 tesserocr 识别二值图，"data" 结果整理为与 image_to_data 相同格式的字典"""
+        h, w = bw.shape
+        with self._tess_lock:
+            api.SetPageSegMode(int(psm) if psm else tesserocr.PSM.AUTO)
+            api.SetImageBytes(bw.tobytes(), w, h, 1, w)
+            if kind == "string":
+                return api.GetUTF8Text()
+
+            api.Recognize()
+            data = {field: [] for field in _OCR_DATA_FIELDS}
+            iterator = api.GetIterator()
+            if iterator is None:
+                return data
+            level = tesserocr.RIL.WORD
+            for word in tesserocr.iterate_level(iterator, level):
+                box = word.BoundingBox(level)
+                if box is None:
+                    continue
+                x1, y1, x2, y2 = box
+                data['level'].append(5)  # 与 image_to_data 中单词级别的编号一致
+                data['text'].append(word.GetUTF8Text(level) or "")
+                data['conf'].append(word.Confidence(level))
+                data['left'].append(x1)
+                data['top'].append(y1)
+                data['width'].append(x2 - x1)
+                data['height'].append(y2 - y1)
+            return data
+
+    def _run_prefetch(self, key: tuple, image: np.ndarray, lang: str, psm: Optional[int]):
+        """后台线程中执行的预识别"""
+        try:
+            return self._run_ocr(key, image, lang, "data", psm)
+        finally:
+            with self._ocr_lock:
+                self._ocr_pending.pop(key, None)
+
+    def prefetch(self, image: np.ndarray, lang: str = 'chi_sim+eng', psm: Optional[int] = None) -> Optional[Future]:
+        """
+        在后台线程中提前识别图像，让OCR与截图、点击等ADB操作同时进行
+        之后对同一图像调用 find_text_location 时会等待并直接使用该结果
+        :return: 识别任务的Future，未安装pytesseract时返回None
+        """
+        if not _HAS_OCR:
+            return None
+        key = self._ocr_key(image, lang, "data", psm)
+        with self._ocr_lock:
+            future = self._ocr_pending.get(key)
+            if future is not None:
+                return future
+            if key in self._ocr_cache:
+                future = Future()
+                future.set_result(self._ocr_cache[key])
+                return future
+            if self._prefetch_pool is None:
+                self._prefetch_pool = ThreadPoolExecutor(max_workers=1)
+            # 复制图像，调用方之后修改或复用缓冲区(如截图流)不会影响识别
+            future = self._prefetch_pool.submit(self._run_prefetch, key, image.copy(), lang, psm)
+            self._ocr_pending[key] = future
+        return future
+
+    def extract_text(self, image: np.ndarray, lang: str = 'chi_sim+eng', psm: Optional[int] = None) -> Optional[str]:
         """
         使用OCR提取图像中的文字
         需要安装pytesseract
         """
-        try:
-            from pytesseract import image_to_string
-            pil_img = Image.fromarray(image)
-            return image_to_string(pil_img, lang=lang)
-        except ImportError:
-            print("未安装pytesseract，无法进行OCR识别")
+        if not _HAS_OCR:
+            print(_NO_OCR_MSG)
             return None
+        try:
+            return self._ocr(image, lang, kind="string", psm=psm)
         except Exception as e:
             print(f"OCR识别失败: {e}")
             return None
 
-    def find_text_location(self, image: np.ndarray, target_text: str, lang: str = 'chi_sim+eng') -> Tuple[Optional[Tuple[int, int]], str]:
+    def find_text_location(self, image: np.ndarray, target_text: str, lang: str = 'chi_sim+eng',
+                           psm: Optional[int] = None) -> Tuple[Optional[Tuple[int, int]], str]:
         """
         使用OCR查找特定文本的位置，并返回识别到的所有文本。
+        同一张截图查找多个文本时只识别一次
         :param image: 源图像
         :param target_text: 要查找的文本
         :param lang: Tesseract语言包
+        :param psm: Tesseract页面分割模式(可选)
         :return: (文本中心坐标或None, 识别到的所有文本)
         """
+        if not _HAS_OCR:
+            print(_NO_OCR_MSG)
+            return None, _NO_OCR_MSG
         try:
-            from pytesseract import image_to_data, Output
-            
             # 使用image_to_data获取详细的识别数据
-            data = image_to_data(image, lang=lang, output_type=Output.DICT)
+            data = self._ocr(image, lang, psm=psm)
             
-            all_recognized_text = []
+            texts = [t.strip() for t in data['text']]
+            all_recognized_text = [t for t in texts if t]  # 我们只关心有文本的块
             found_location = None
-            
-            n_boxes = len(data['level'])
-            for i in range(n_boxes):
-                # 我们只关心有文本的块
-                text = data['text'][i].strip()
-                if text:
-                    all_recognized_text.append(text)
-
-                if int(data['conf'][i]) > 60: # 置信度阈值
-                    if target_text in text and found_location is None: # 找到第一个匹配的就记录
-                        # 找到了包含目标文本的块
-                        (x, y, w, h) = (data['left'][i], data['top'][i], data['width'][i], data['height'][i])
-                        
-                        # 计算中心点
-                        center_x = x + w // 2
-                        center_y = y + h // 2
-                        print(f"找到文本 '{target_text}' 在位置: ({center_x}, {center_y})")
-                        found_location = (center_x, center_y)
-                        
+
+            # 一次性筛选出置信度达标的块，只对这些块做子串查找
+            confs = np.asarray(data['conf'], dtype=np.float32).astype(np.int32)
+            for i in np.flatnonzero(confs > 60):  # 置信度阈值
+                if target_text in texts[i]:  # 找到第一个匹配的就记录
+                    # 找到了包含目标文本的块
+                    (x, y, w, h) = (data['left'][i], data['top'][i], data['width'][i], data['height'][i])
+
+                    # 计算中心点
+                    center_x = x + w // 2
+                    center_y = y + h // 2
+                    print(f"找到文本 '{target_text}' 在位置: ({center_x}, {center_y})")
+                    found_location = (center_x, center_y)
+                    break
+
             full_text = " ".join(all_recognized_text)
             return found_location, full_text
             
-        except ImportError:
-            error_msg = "未安装pytesseract，无法进行OCR识别"
-            print(error_msg)
-            return None, error_msg
         except Exception as e:
             error_msg = f"OCR文本定位失败: {e}"
             print(error_msg)
             return None, error_msg
             
+    def _cached_gray(self, img: np.ndarray) -> np.ndarray:
+        """转换为灰度图，同一个图像对象重复比较时复用转换结果"""
+        cached = self._gray_cache.get(id(img))
+        # 同时保存原图引用，防止对象被回收后id被复用
+        if cached is not None and cached[0] is img:
+            return cached[1]
+        gray = self._to_gray(img)
+        self._gray_cache[id(img)] = (img, gray)
+        if len(self._gray_cache) > 4:
+            self._gray_cache.popitem(last=False)
+        return gray
+
+    @staticmethod
+    def _ssim(gray1: np.ndarray, gray2: np.ndarray) -> float:
+        """按标准公式(11x11高斯窗口, sigma=1.5)计算两张灰度图的平均结构相似性"""
+        i1 = gray1.astype(np.float32)
+        i2 = gray2.astype(np.float32)
+        blur = lambda m: cv2.GaussianBlur(m, (11, 11), 1.5)
+        mu1, mu2 = blur(i1), blur(i2)
+        mu1_sq, mu2_sq, mu1_mu2 = mu1 * mu1, mu2 * mu2, mu1 * mu2
+        sigma1_sq = blur(i1 * i1) - mu1_sq
+        sigma2_sq = blur(i2 * i2) - mu2_sq
+        sigma12 = blur(i1 * i2) - mu1_mu2
+        ssim_map = ((2 * mu1_mu2 + _SSIM_C1) * (2 * sigma12 + _SSIM_C2)) / \
+                   ((mu1_sq + mu2_sq + _SSIM_C1) * (sigma1_sq + sigma2_sq + _SSIM_C2))
+        return float(ssim_map.mean())
+
     def compare_images(self, img1: np.ndarray, img2: np.ndarray) -> float:
         """
         比较两张图像的相似度
+        先计算均方误差，明显不同的图像直接返回0(不会高于任何经过SSIM计算的相似图像)，否则计算结构相似性(SSIM)
         返回相似度百分比(0-1)
         """
         try:
             # 转换为灰度图
-            gray1 = cv2.cvtColor(img1, cv2.COLOR_RGB2GRAY)
-            gray2 = cv2.cvtColor(img2, cv2.COLOR_RGB2GRAY)
-            
+            gray1 = self._cached_gray(img1)
+            gray2 = self._cached_gray(img2)
+            if gray1.shape != gray2.shape:
+                raise ValueError(f"图像尺寸不一致 {gray1.shape} 与 {gray2.shape}")
+
+            diff = cv2.absdiff(gray1, gray2).astype(np.float32)
+            mse = float(cv2.mean(diff * diff)[0])
+            if mse > _SSIM_MSE_CUTOFF:
+                return 0.0
+
             # 计算结构相似性
-            (score, _) = cv2.compareSSIM(gray1, gray2, full=True)
-            return score
+            return self._ssim(gray1, gray2)
+        except Exception as e:
+            print(f"图像比较失败: {e}")
+            return 0.0
+
+    def compare_images_fast(self, img1: np.ndarray, img2: np.ndarray) -> float:
+        """
+        用峰值信噪比(PSNR)快速比较两张图像，比SSIM快得多
+        返回值单位为dB，越大越相似，完全相同时OpenCV返回361
+        """
+        try:
+            return cv2.PSNR(self._cached_gray(img1), self._cached_gray(img2))
         except Exception as e:
             print(f"图像比较失败: {e}")
             return 0.0
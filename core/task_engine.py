@@ -6,14 +6,48 @@
 负责自动化任务的执行和管理
 """
 
+import ast
 import json
+import keyword
 import time
-import os
-from typing import Dict, Any, List
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+import cv2
+import numpy as np
 from core.adb_controller import ADBController
 from core.image_processor import ImageProcessor
 
+# 带有这些选项的任务需要逐个执行，不能合并为批量输入
+_UNBATCHABLE_KEYS = ("pre_condition", "post_action", "on_fail_action",
+                     "wait_for_success", "continue_on_fail", "enable_timer",
+                     "retries", "timeout")
+# 一次最多合并的任务数，批量执行期间无法响应停止，批次之间会检查是否已停止
+_MAX_BATCH_TASKS = 20
+# 流程控制任务由 run() 处理，_execute_task 中没有对应的处理函数
+_CONTROL_FLOW = frozenset({"LOOP", "END_LOOP"})
+# 条件和动作表达式中允许出现的语法节点；属性访问、推导式、lambda 等可绕过沙箱的写法都不允许
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp, ast.Compare, ast.IfExp,
+    ast.Call, ast.keyword, ast.Name, ast.Constant, ast.Tuple, ast.List,
+    ast.Subscript, ast.Slice, ast.expr_context,
+    ast.boolop, ast.operator, ast.unaryop, ast.cmpop,
+)
+
 class TaskEngine:
+    # 将用户输入的单独的 `=` 转换为 `==`，同时避免替换 `!=`, `>=`, `<=`
+    _EQ_RE = re.compile(r'(?<![=<>!])=(?![=])')
+    # 一次扫描替换 `&&`、`||` 和 `!` 逻辑运算符；`!=` 是比较运算符，不替换
+    _LOGIC_RE = re.compile(r'&&|\|\||!(?!=)')
+    _LOGIC_MAP = {"&&": " and ", "||": " or ", "!": " not "}
+    # 表达式中只允许使用的安全内置函数
+    _SAFE_GLOBALS = {
+        "__builtins__": {
+            "abs": abs, "max": max, "min": min, "round": round, "len": len,
+            "str": str, "int": int, "float": float, "bool": bool
+        }
+    }
+
     def __init__(self, adb: ADBController, img_processor: ImageProcessor, settings: Dict[str, Any]):
         """初始化任务引擎"""
         self.adb = adb
@@ -37,8 +71,34 @@ class TaskEngine:
         self.max_retries = self.settings.get("retry_count", 3)
         self.retry_delay = self.settings.get("retry_interval", 1.0)
         self.timeout = self.settings.get("timeout", 30)
-        self.task_delay = self.settings.get("task_delay", 0.01) # 任务延时，最低10ms
+        self.task_delay = self.settings.get("task_delay", 0) # 任务间延时，为0时不等待
+        self.batch_input = self.settings.get("batch_input", True) # 是否合并连续的坐标输入任务
+        self.framebuffer_stream = self.settings.get("framebuffer_stream", False) # 是否通过持续截图流获取截图
+        self._stream_failed = False  # 本次运行中截图流启动失败，之后改用普通截图
+        # 表达式缓存：脚本中的条件和动作是固定的字符串，循环中重复执行时无需再次解析和编译
+        self._code_cache = {}  # 规范化后的表达式 -> 编译后的代码对象
+        self._condition_cache = {}  # 原始条件字符串 -> ((条件, 代码对象), ...)
+        self._action_cache = {}  # 原始动作字符串 -> ((变量名, 代码对象或None, 常量值), ...)
+        self._value_cache = {}  # set_variable 的原始字符串值 -> 转换后的数字或字符串
+        # 识别任务重试时，在重试间隔的最后一段时间里于后台截图，截图与等待同时进行
+        self._capture_pool = None  # 首次需要时创建的后台截图线程，运行结束时关闭
+        self._next_capture = None  # 预先开始的截图(Future，结果为截图数据)
+        self._capture_time = 0.0  # 最近一次截图所用的时间(秒)，决定提前多久开始截图
+        # 任务类型 -> 处理函数
+        self._handlers = {
+            "screenshot": self._handle_screenshot,
+            "click": self._handle_click,
+            "long_press": self._handle_long_press,
+            "wait": self._handle_wait,
+            "set_variable": self._handle_set_variable,
+            "swipe": self._handle_swipe,
+            "ocr": self._handle_ocr,
+            "find_and_click_one": self._handle_find_and_click_one,
+            "restart_app": self._handle_restart_app,
+        }
         self.img_processor.threshold = self.settings.get("image_threshold", 0.8)
+        self.img_processor.match_max_dim = self.settings.get("match_max_dim", 1280)
+        self.img_processor.ocr_max_dim = self.settings.get("ocr_max_dim", 1280)
         
     def load_tasks(self, tasks_config: List[Dict[str, Any]]):
         """加载任务配置"""
@@ -67,7 +127,7 @@ class TaskEngine:
         """执行任务队列"""
         self.is_running = True
         self.last_success_time = None # 重置计时器
-        self.run_start_time = time.time() # 记录任务流开始时间
+        self.run_start_time = time.monotonic() # 记录任务流开始时间(单调时钟，不受系统时间调整影响)
         self.success_counts = {} # 重置成功次数计数器
         if self.device_id and not self.adb.connect_device(self.device_id):
             raise Exception(f"无法连接设备: {self.device_id}")
@@ -76,14 +136,32 @@ class TaskEngine:
             jump_map = self._build_jump_map()
         except ValueError as e:
             raise Exception(f"任务结构错误: {e}")
+        prepared = self._prepare_tasks()
+
+        self._stream_failed = False
+        try:
+            self._run_tasks(prepared, jump_map, progress_callback, is_running_callable)
+        finally:
+            self._discard_prefetch()
+            if self._capture_pool is not None:
+                self._capture_pool.shutdown(wait=False)
+                self._capture_pool = None
+            if self.framebuffer_stream:
+                self.adb.stop_framebuffer_stream()
 
+        if not self.is_running:
+            self._log(None, "任务被用户停止")
+
+    def _run_tasks(self, prepared: List[tuple], jump_map: Dict[int, int], progress_callback, is_running_callable):
+        """按顺序执行任务队列，处理循环跳转"""
         total_tasks = len(self.task_queue)
         i = 0
+        unbatched_until = 0  # 批量执行失败后，这之前的任务改为逐个执行
         while i < total_tasks and self.is_running and is_running_callable():
             task = self.task_queue[i]
             self.current_task = task
             
-            task_type = task.get("type")
+            task_type, handler, _ = prepared[i]
 
             if task_type == "LOOP":
                 # 检查进入循环的条件
@@ -101,9 +179,29 @@ class TaskEngine:
                     self._log(task, f"满足停止条件 '{task['pre_condition']}'，正在退出循环。")
                     i += 1 
                     continue
+
+            # 连续的纯坐标输入任务合并为一次adb调用执行
+            if self.batch_input and i >= unbatched_until:
+                batch = self._collect_input_batch(prepared, i, total_tasks)
+                if len(batch) > 1:
+                    done = self._execute_input_batch(batch)
+                    if done < len(batch):
+                        # 批量执行失败时，已经执行完成的输入不再重复；
+                        # 从第一个没有确认完成的任务开始逐个执行，每个任务按原来的方式重试
+                        unbatched_until = i + len(batch)
+                        i += done
+                        if done and progress_callback:
+                            progress_callback(i, total_tasks)
+                        continue
+                    i += len(batch)
+                    if progress_callback:
+                        progress_callback(i, total_tasks)
+                    if self.task_delay > 0:
+                        time.sleep(self.task_delay)
+                    continue
             
             try:
-                self._execute_task(task)
+                self._execute_task(task, handler)
             except Exception as e:
                 # 检查是否设置了“失败时继续”
                 if task.get("continue_on_fail", False):
@@ -120,9 +218,85 @@ class TaskEngine:
                 time.sleep(self.task_delay)
             
             i += 1
-        
-        if not self.is_running:
-            self._log(None, "任务被用户停止")
+
+    def _prepare_tasks(self) -> List[tuple]:
+        """
+        运行前对每个任务做一次预处理，避免在循环中重复解析:
+        解析任务类型、处理函数和可合并的输入操作，并预先编译条件和动作表达式
+        结果保存在与任务队列一一对应的列表中，不修改任务字典本身(任务字典会被界面编辑并保存为JSON)
+        :return: [(任务类型, 处理函数, 输入操作或None), ...]
+        """
+        prepared = []
+        for task in self.task_queue:
+            task_type = task.get("type")
+            for key in ("pre_condition", "post_action", "on_fail_action"):
+                if task.get(key):
+                    self._precompile(task[key], is_condition=(key == "pre_condition"))
+            prepared.append((task_type, self._handlers.get(task_type), self._input_op(task)))
+        return prepared
+
+    def _precompile(self, expression: str, is_condition: bool):
+        """预先解析并编译表达式；格式错误时跳过，留到执行时按原有方式报告"""
+        try:
+            if is_condition:
+                self._compiled_conditions(expression)
+            else:
+                self._compiled_action(expression)
+        except (SyntaxError, ValueError, NameError):
+            pass
+
+    def _input_op(self, task: Dict[str, Any]):
+        """如果任务是可以合并执行的纯坐标输入操作，返回对应的batch_input操作，否则返回None"""
+        if any(task.get(key) for key in _UNBATCHABLE_KEYS):
+            return None
+
+        task_type = task.get("type")
+        if task_type == "click":
+            x, y = task.get("x"), task.get("y")
+            if x is None or y is None or task.get("target_text") or task.get("target"):
+                return None
+            return ("tap", x, y)
+        if task_type == "swipe":
+            coords = [task.get(k) for k in ("x1", "y1", "x2", "y2")]
+            if None in coords:
+                return None
+            return ("swipe", *coords, task.get("duration", 300))
+        if task_type == "long_press":
+            x, y = task.get("x"), task.get("y")
+            if x is None or y is None:
+                return None
+            return ("long_press", x, y, task.get("duration", 1000))
+        return None
+
+    def _collect_input_batch(self, prepared: List[tuple], start: int, end: int) -> List[tuple]:
+        """从start开始收集连续的可合并输入任务，返回 [(任务, 操作), ...]"""
+        batch = []
+        for i in range(start, min(end, start + _MAX_BATCH_TASKS)):
+            op = prepared[i][2]
+            if op is None:
+                break
+            batch.append((self.task_queue[i], op))
+        return batch
+
+    def _execute_input_batch(self, batch: List[tuple]) -> int:
+        """
+        批量执行输入操作，任务间的延时以shell的sleep代替
+        :return: 已确认执行完成的任务数；少于任务数时由调用方逐个执行剩下的任务
+        """
+        ops = []
+        for task, op in batch:
+            if ops and self.task_delay > 0:
+                ops.append(("sleep", self.task_delay))
+            ops.append(op)
+            self._log(task, f"合并执行输入任务: {task.get('description')} {op}")
+
+        success, message, done = self.adb.batch_input(ops)
+        self.img_processor.invalidate()  # 输入后画面可能变化，丢弃旧的匹配结果
+        if not success:
+            done = min(done, len(batch) - 1)  # 失败时至少有一个任务没有完成
+            self._log(None, f"批量输入操作失败(已完成{done}/{len(batch)}个任务)，剩下的任务改为逐个执行: {message}")
+            return done
+        return len(batch)
 
     def stop(self):
         """停止任务执行"""
@@ -134,8 +308,11 @@ class TaskEngine:
         if task is None or task.get("print_log", False):
             print(message)
 
-    def _execute_task(self, task: Dict[str, Any]):
-        """执行单个任务"""
+    def _execute_task(self, task: Dict[str, Any], handler=None):
+        """
+        执行单个任务
+        :param handler: 预先解析好的处理函数，未提供时按任务类型查找
+        """
         # 1. 检查前置条件
         if "pre_condition" in task:
             try:
@@ -157,9 +334,12 @@ class TaskEngine:
             # 非阻塞任务：使用任务定义或全局设置
             timeout = task.get("timeout", self.timeout)
 
-        start_time = time.time()
+        start_time = time.monotonic()
         last_error = None
-        
+        needs_capture = self._needs_capture(task)
+        # 丢弃之前预先开始的截图，画面可能已经变化
+        self._discard_prefetch()
+
         attempt = 0
         while True: # 改为无限循环，由内部逻辑控制退出
             # 检查是否被外部停止
@@ -170,29 +350,15 @@ class TaskEngine:
             attempt += 1
             try:
                 # 检查超时（仅当timeout不为None时）
-                if timeout is not None and time.time() - start_time > timeout:
+                if timeout is not None and time.monotonic() - start_time > timeout:
                     raise TimeoutError(f"任务执行超时({timeout}秒)")
                 
                 # 2. 执行核心任务逻辑
-                if task_type == "screenshot":
-                    self._handle_screenshot(task)
-                elif task_type == "click":
-                    self._handle_click(task)
-                elif task_type == "long_press":
-                    self._handle_long_press(task)
-                elif task_type == "wait":
-                    self._handle_wait(task)
-                elif task_type == "set_variable":
-                    self._handle_set_variable(task)
-                elif task_type == "swipe":
-                    self._handle_swipe(task)
-                elif task_type == "ocr":
-                    self._handle_ocr(task)
-                elif task_type == "find_and_click_one":
-                    self._handle_find_and_click_one(task)
-                elif task_type == "restart_app":
-                    self._handle_restart_app(task)
-                elif task_type not in ["LOOP", "END_LOOP"]:
+                if handler is None:
+                    handler = self._handlers.get(task_type)
+                if handler is not None:
+                    handler(task)
+                elif task_type not in _CONTROL_FLOW:
                     self._log(task, f"未知任务类型: {task_type}")
                 
                 # 3. 执行成功后，处理后置动作
@@ -202,7 +368,8 @@ class TaskEngine:
                     except Exception as e:
                         raise Exception(f"执行后置动作失败: {e}")
 
-                # 执行成功，退出循环
+                # 执行成功，退出循环；没有用到的预先截图直接丢弃
+                self._discard_prefetch()
                 self._handle_task_success(task)
                 return
                 
@@ -228,8 +395,114 @@ class TaskEngine:
                     # 阻塞模式下，只打印日志，不减少重试次数
                     self._log(task, f"阻塞任务执行失败，将在 {self.retry_delay} 秒后重试... 错误: {e}")
 
-                time.sleep(self.retry_delay)
+                self._retry_wait(needs_capture)
             
+    @staticmethod
+    def _needs_capture(task: Dict[str, Any]) -> bool:
+        """任务执行时是否需要截图识别"""
+        task_type = task.get("type")
+        if task_type == "click":
+            return bool(task.get("target_text") or task.get("target"))
+        return task_type in ("find_and_click_one", "ocr")
+
+    def _retry_wait(self, prefetch: bool):
+        """
+        等待重试间隔
+        :param prefetch: 下一次尝试需要截图时，在间隔结束前一次截图耗时的时候开始在后台截图，
+                         截图在间隔结束时基本完成，画面也不会比间隔结束时旧多少
+        """
+        if not prefetch:
+            time.sleep(self.retry_delay)
+            return
+        lead = min(self.retry_delay, self._capture_time)
+        time.sleep(self.retry_delay - lead)
+        self._start_prefetch()
+        time.sleep(lead)
+
+    def _start_prefetch(self):
+        """在后台开始截图，由下一次尝试的 _capture_screen 取用"""
+        self._discard_prefetch()
+        if self.framebuffer_stream and not self._stream_failed:
+            return  # 从截图流读取已经省去了启动截图的开销
+        if self._capture_pool is None:
+            self._capture_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="capture")
+        self._next_capture = self._capture_pool.submit(self._timed_screenshot)
+
+    def _discard_prefetch(self):
+        """丢弃还没有取用的预先截图；尚未开始的直接取消"""
+        if self._next_capture is not None:
+            self._next_capture.cancel()
+            self._next_capture = None
+
+    def _capture_screen(self, purpose: str) -> np.ndarray:
+        """
+        获取截图并直接在内存中解码，不经过临时文件
+        任务重试时优先使用在重试间隔中于后台开始的截图
+        :param purpose: 用于错误信息的说明
+        """
+        future, self._next_capture = self._next_capture, None
+        return self._grab_screen(purpose, future.result() if future is not None else None)
+
+    def _grab_screen(self, purpose: str, data: bytes = None) -> np.ndarray:
+        """截图并解码，失败时抛出异常；data 为已经截取的截图数据"""
+        if data is None and self.framebuffer_stream and not self._stream_failed:
+            frame = self._stream_frame()
+            if frame is not None:
+                return frame
+        if data is None:
+            data = self._timed_screenshot()
+        if data is None:
+            raise Exception(f"{purpose}截图失败")
+        source_img = self.img_processor.decode_bytes(data)
+        if source_img is None:
+            raise Exception(f"{purpose}截图解码失败")
+        return source_img
+
+    def _timed_screenshot(self) -> Optional[bytes]:
+        """截图并记录所用时间"""
+        start = time.monotonic()
+        data = self.adb.screenshot_bytes()
+        self._capture_time = time.monotonic() - start
+        return data
+
+    def _stream_frame(self):
+        """
+        从截图流读取一帧当前画面，转换为与 decode_bytes 相同的RGB图像(复制一份，截图流会复用缓冲区)
+        截图流未启动时先启动，启动失败或断开时返回None
+        """
+        frame = self.adb.next_frame(fresh=True)
+        if frame is None:
+            if not self.adb.start_framebuffer_stream():
+                print("启动截图流失败，本次运行改用普通截图")
+                self._stream_failed = True
+                return None
+            frame = self.adb.next_frame()
+            if frame is None:
+                return None
+        return cv2.cvtColor(frame, cv2.COLOR_RGBA2RGB)
+
+    @staticmethod
+    def _crop_roi(source_img: np.ndarray, task: Dict[str, Any]) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        按任务的识别区域裁剪截图，只处理目标所在的部分
+        识别区域为 "roi": [x, y, 宽, 高]，兼容OCR任务原有的 "area": [x1, y1, x2, y2]
+        :return: (裁剪后的图像, 区域左上角偏移)，未设置区域时返回原图和(0, 0)
+        """
+        roi = task.get("roi")
+        if roi and len(roi) == 4:
+            x1, y1, x2, y2 = roi[0], roi[1], roi[0] + roi[2], roi[1] + roi[3]
+        elif task.get("area") and len(task["area"]) == 4:
+            x1, y1, x2, y2 = task["area"]
+        else:
+            return source_img, (0, 0)
+        height, width = source_img.shape[:2]
+        x1, x2 = max(0, int(x1)), min(width, int(x2))
+        y1, y2 = max(0, int(y1)), min(height, int(y2))
+        if x1 >= x2 or y1 >= y2:
+            raise Exception(f"识别区域超出截图范围: {roi or task.get('area')}")
+        # 切片只是视图，不复制像素
+        return source_img[y1:y2, x1:x2], (x1, y1)
+
     def _handle_screenshot(self, task: Dict[str, Any]):
         """处理截图任务"""
         save_path = task["save_path"]
@@ -247,6 +520,7 @@ class TaskEngine:
 
         self._log(task, f"正在执行坐标长按: ({x}, {y})，时长: {duration}ms")
         success, message = self.adb.long_press(x, y, duration)
+        self.img_processor.invalidate()  # 输入后画面可能变化，丢弃旧的匹配结果
         if not success:
             raise Exception(f"坐标长按 ({x}, {y}) 失败: {message}")
 
@@ -271,20 +545,14 @@ class TaskEngine:
         if x is not None and y is not None and not target_text and not target_image_path:
             self._log(task, f"正在执行坐标点击: ({x}, {y})")
             success, message = self.adb.tap(x, y)
+            self.img_processor.invalidate()  # 输入后画面可能变化，丢弃旧的匹配结果
             if not success:
                 raise Exception(f"坐标点击 ({x}, {y}) 失败: {message}")
             return
 
         # 对于需要识别的点击，先截图
         self._log(task, "需要进行图像/文字识别，正在截取屏幕...")
-        temp_screenshot_path = os.path.join(self.base_dir, "temp_screen_click.png")
-        success, message = self.adb.screenshot(temp_screenshot_path)
-        if not success:
-            raise Exception(f"获取截图以进行识别失败: {message}")
-        
-        source_img = self.img_processor.load_image(temp_screenshot_path)
-        if source_img is None:
-            raise Exception("加载用于识别的截图失败")
+        source_img, offset = self._crop_roi(self._capture_screen("获取用于识别的"), task)
 
         # 按优先级确定点击坐标
         click_pos = None
@@ -293,7 +561,7 @@ class TaskEngine:
         if target_text:
             self._log(task, f"正在通过OCR查找文字: '{target_text}'")
             lang = task.get("lang", self.ocr_language)
-            click_pos, recognized_text = self.img_processor.find_text_location(source_img, target_text, lang=lang)
+            click_pos, recognized_text = self.img_processor.find_text_location(source_img, target_text, lang=lang, psm=task.get("psm"))
             if click_pos is None:
                 error_detail = f"实际识别内容: '{recognized_text}'" if recognized_text else "未识别到任何文字。"
                 raise Exception(f"未找到目标文字 '{target_text}'。{error_detail}")
@@ -301,7 +569,7 @@ class TaskEngine:
         # 优先级2: 图像匹配
         elif target_image_path:
             self._log(task, f"正在通过模板匹配查找图像: {target_image_path}")
-            template_img = self.img_processor.load_image(target_image_path)
+            template_img = self.img_processor.load_template(target_image_path)
             if template_img is None:
                 raise Exception(f"加载目标图像失败: {target_image_path}")
             
@@ -316,6 +584,10 @@ class TaskEngine:
             if click_pos is None:
                 raise Exception(f"未找到目标图像: {target_image_path} (置信度: {current_threshold})")
 
+        # 识别结果是区域内的坐标，换算回整个屏幕
+        if click_pos is not None and (target_text or target_image_path):
+            click_pos = (click_pos[0] + offset[0], click_pos[1] + offset[1])
+
         # 优先级3: 指定坐标 (作为后备)
         elif x is not None and y is not None:
             click_pos = (x, y)
@@ -327,6 +599,7 @@ class TaskEngine:
         final_x, final_y = click_pos
         self._log(task, f"最终确定点击坐标: ({final_x}, {final_y})")
         success, message = self.adb.tap(final_x, final_y)
+        self.img_processor.invalidate()  # 输入后画面可能变化，丢弃旧的匹配结果
         if not success:
             raise Exception(f"点击坐标 ({final_x}, {final_y}) 失败: {message}")
 
@@ -339,14 +612,7 @@ class TaskEngine:
             raise Exception("find_and_click_one 任务需要一个 'targets' 列表参数。")
 
         self._log(task, "开始执行 'find_and_click_one' 任务，准备截图...")
-        temp_screenshot_path = os.path.join(self.base_dir, "temp_screen_find_one.png")
-        success, message = self.adb.screenshot(temp_screenshot_path)
-        if not success:
-            raise Exception(f"为 'find_and_click_one' 任务截图失败: {message}")
-        
-        source_img = self.img_processor.load_image(temp_screenshot_path)
-        if source_img is None:
-            raise Exception("为 'find_and_click_one' 加载截图失败。")
+        source_img, offset = self._crop_roi(self._capture_screen("为 'find_and_click_one' 任务"), task)
 
         # 保存并临时设置阈值
         original_threshold = self.img_processor.threshold
@@ -354,30 +620,35 @@ class TaskEngine:
         self.img_processor.threshold = current_threshold
 
         try:
+            # 先加载全部模板(已缓存)，再在同一张截图上一次性按顺序匹配，截图只转换一次灰度
+            templates = []
             for target_path in target_image_paths:
-                self._log(task, f"正在尝试匹配图片: {target_path}")
-                template_img = self.img_processor.load_image(target_path)
+                template_img = self.img_processor.load_template(target_path)
                 if template_img is None:
                     self._log(task, f"警告: 加载目标图片失败，已跳过: {target_path}")
-                    continue
-                
-                click_pos = self.img_processor.find_template(source_img, template_img)
-                if click_pos:
-                    final_x, final_y = click_pos
-                    self._log(task, f"成功找到图片 '{target_path}' 在坐标: ({final_x}, {final_y})。")
-                    
-                    if judge_only:
-                        self._log(task, "模式为“仅判断”，跳过点击操作。")
-                    else:
-                        self._log(task, "执行点击操作...")
-                        success, message = self.adb.tap(final_x, final_y)
-                        if not success:
-                            raise Exception(f"点击目标 '{target_path}' 失败: {message}")
-                    
-                    # 成功找到（并根据模式决定是否点击）后，任务完成
-                    return
-            
-            # 如果循环完成都没有找到任何图片
+                templates.append(template_img)
+
+            self._log(task, f"正在按顺序匹配 {len(target_image_paths)} 张图片...")
+            found = self.img_processor.find_any_template(source_img, templates)
+            if found is not None:
+                index, x, y = found
+                target_path = target_image_paths[index]
+                final_x, final_y = x + offset[0], y + offset[1]
+                self._log(task, f"成功找到图片 '{target_path}' 在坐标: ({final_x}, {final_y})。")
+
+                if judge_only:
+                    self._log(task, "模式为“仅判断”，跳过点击操作。")
+                else:
+                    self._log(task, "执行点击操作...")
+                    success, message = self.adb.tap(final_x, final_y)
+                    self.img_processor.invalidate()  # 输入后画面可能变化，丢弃旧的匹配结果
+                    if not success:
+                        raise Exception(f"点击目标 '{target_path}' 失败: {message}")
+
+                # 成功找到（并根据模式决定是否点击）后，任务完成
+                return
+
+            # 如果全部模板都没有匹配上
             raise Exception(f"未能在屏幕上找到任何一个目标图片 (置信度: {current_threshold})。")
 
         finally:
@@ -390,20 +661,12 @@ class TaskEngine:
         if not variable_name:
             raise Exception("OCR任务缺少 'variable_name' 参数")
 
-        # 1. 获取截图
-        temp_screenshot_path = os.path.join(self.base_dir, "temp_screen_ocr.png")
-        success, message = self.adb.screenshot(temp_screenshot_path)
-        if not success:
-            raise Exception(f"OCR截图失败: {message}")
-
-        # 2. 加载图像
-        source_img = self.img_processor.load_image(temp_screenshot_path)
-        if source_img is None:
-            raise Exception("OCR加载截图失败")
+        # 1. 获取截图，只识别指定区域
+        source_img, _ = self._crop_roi(self._capture_screen("OCR"), task)
 
         # 3. 提取文字
         lang = task.get("lang", self.ocr_language)
-        extracted_text = self.img_processor.extract_text(source_img, lang=lang)
+        extracted_text = self.img_processor.extract_text(source_img, lang=lang, psm=task.get("psm"))
         if extracted_text is None:
             # extract_text 内部会打印错误，这里可以认为识别失败但不是致命错误
             self._log(task, f"OCR未能识别出任何文字 (语言: {lang})")
@@ -416,31 +679,16 @@ class TaskEngine:
 
     def _evaluate_expression(self, expression: str) -> bool:
         """安全地评估逻辑表达式"""
-        import re
-        # 替换逻辑运算符
-        expression = expression.replace("&&", " and ").replace("||", " or ").replace("!", " not ")
-        
-        # 修正：将用户输入的 `=` 转换为 `==` 以进行比较，同时避免替换 `!=`, `>=`, `<=`
-        # 使用正则表达式确保只替换单独的 `=`
-        expression = re.sub(r'(?<![=<>!])=(?![=])', '==', expression)
-
-        # 构建一个安全的局部变量环境
-        local_scope = self.variables.copy()
-
-        # 只允许安全的内置函数
-        safe_globals = {
-            "__builtins__": {
-                "abs": abs, "max": max, "min": min, "round": round, "len": len,
-                "str": str, "int": int, "float": float, "bool": bool
-            }
-        }
-        
-        # 拆分多个条件
-        conditions = [cond.strip() for cond in expression.split(';')]
-        for cond in conditions:
-            if not cond: continue
+        try:
+            conditions = self._compiled_conditions(expression)
+        except (SyntaxError, ValueError) as e:
+            self._log(None, f"评估表达式 '{expression}' 时出错: {e}")
+            return False
+
+        # 条件只读取变量，直接以变量字典作为局部环境，无需每次复制
+        for cond, code in conditions:
             try:
-                if not eval(cond, safe_globals, local_scope):
+                if not eval(code, TaskEngine._SAFE_GLOBALS, self.variables):
                     return False # 任何一个条件不满足则整体为False
             except Exception as e:
                 self._log(None, f"评估表达式 '{cond}' 时出错: {e}")
@@ -448,36 +696,107 @@ class TaskEngine:
                 return False
         return True
 
-    def _execute_action(self, action: str):
-        """安全地执行赋值操作"""
-        # 构建一个安全的局部变量环境
-        local_scope = self.variables.copy()
-        safe_globals = {
-            "__builtins__": {
-                "abs": abs, "max": max, "min": min, "round": round, "len": len,
-                "str": str, "int": int, "float": float, "bool": bool
-            }
-        }
+    @staticmethod
+    def _normalize_conditions(expression: str) -> List[str]:
+        """把用户输入的条件转换为Python表达式，并按 `;` 拆分为多个条件"""
+        # 替换逻辑运算符
+        expression = TaskEngine._LOGIC_RE.sub(lambda m: TaskEngine._LOGIC_MAP[m.group()], expression)
+
+        # 修正：将用户输入的 `=` 转换为 `==` 以进行比较(正则在类定义时预编译)
+        expression = TaskEngine._EQ_RE.sub('==', expression)
 
-        # 分割多个赋值语句
+        # 拆分多个条件
+        return [cond for cond in map(str.strip, expression.split(';')) if cond]
+
+    def _compiled_conditions(self, expression: str) -> tuple:
+        """返回条件字符串拆分并编译后的 ((条件, 代码对象), ...)，结果按原始字符串缓存"""
+        conditions = self._condition_cache.get(expression)
+        if conditions is None:
+            conditions = self._condition_cache[expression] = tuple(
+                (cond, self._compile(cond)) for cond in self._normalize_conditions(expression))
+        return conditions
+
+    def _compiled_action(self, action: str) -> tuple:
+        """
+        返回动作字符串拆分并编译后的 ((变量名, 代码对象, 常量值), ...)，结果按原始字符串缓存
+        右侧是数字/字符串等不可变常量时(如 `enter=1`)代码对象为None，执行时直接赋值，不再调用eval
+        """
+        assignments = self._action_cache.get(action)
+        if assignments is None:
+            compiled = []
+            for var_name, expr, _ in self._parse_action(action):
+                code = self._compile(expr)
+                constant = self._constant_value(expr)
+                compiled.append((var_name, None, constant) if constant is not None else (var_name, code, None))
+            assignments = self._action_cache[action] = tuple(compiled)
+        return assignments
+
+    @staticmethod
+    def _constant_value(expr: str) -> Any:
+        """表达式是不可变的字面常量时返回其值，否则返回None"""
+        try:
+            value = ast.literal_eval(expr)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            return None
+        # 列表等可变对象每次都要重新创建，不能共享
+        return value if isinstance(value, (int, float, str)) else None
+
+    def _compile(self, source: str):
+        """解析并检查表达式，编译后缓存代码对象"""
+        code = self._code_cache.get(source)
+        if code is None:
+            tree = ast.parse(source, '<expr>', 'eval')
+            self._check_expression(tree)
+            code = self._code_cache[source] = compile(tree, '<expr>', 'eval')
+        return code
+
+    @staticmethod
+    def _check_expression(tree: ast.AST):
+        """按白名单检查语法树，只允许运算、比较、变量、常量和安全内置函数调用"""
+        builtins = TaskEngine._SAFE_GLOBALS["__builtins__"]
+        for node in ast.walk(tree):
+            if not isinstance(node, _ALLOWED_NODES):
+                raise ValueError(f"表达式中不支持的语法: {type(node).__name__}")
+            if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in builtins):
+                raise ValueError(f"表达式中只能调用以下函数: {', '.join(builtins)}")
+
+    @staticmethod
+    def _parse_action(action: str) -> List[tuple]:
+        """
+        把动作字符串拆分为 (变量名, 表达式, 表达式语法树) 列表，并检查格式
+        所有语句拼成一段代码一次解析，每条必须是对单个变量的赋值；只在首次执行(或运行前预编译)时调用一次
+        """
         statements = [stmt.strip() for stmt in action.split(';')]
         for stmt in statements:
-            if not stmt: continue
-            if '=' not in stmt:
+            if stmt and '=' not in stmt:
                 raise ValueError(f"无效的赋值表达式: {stmt}")
-            
-            var_name, expr = [s.strip() for s in stmt.split('=', 1)]
-            
-            # 检查变量名是否合法
-            if not var_name.isidentifier():
-                raise NameError(f"无效的变量名: {var_name}")
 
-            # 计算表达式的值
-            value = eval(expr, safe_globals, local_scope)
-            
-            # 更新到主变量字典和当前的local_scope
+        source = '\n'.join(statements)
+        try:
+            body = ast.parse(source, '<action>', 'exec').body
+        except SyntaxError as e:
+            # 等号左侧不是合法的变量名时给出更明确的提示
+            if e.lineno and e.lineno <= len(statements):
+                var_name = statements[e.lineno - 1].split('=', 1)[0].strip()
+                if not var_name.isidentifier() or keyword.iskeyword(var_name):
+                    raise NameError(f"无效的变量名: {var_name}")
+            raise
+
+        assignments = []
+        for node in body:
+            if not isinstance(node, ast.Assign) or len(node.targets) != 1 or not isinstance(node.targets[0], ast.Name):
+                raise ValueError(f"无效的赋值表达式: {ast.get_source_segment(source, node)}")
+            assignments.append((node.targets[0].id, ast.get_source_segment(source, node.value), node.value))
+        return assignments
+
+    def _execute_action(self, action: str):
+        """安全地执行赋值操作"""
+
+        for var_name, code, constant in self._compiled_action(action):
+            # 计算表达式的值；赋值都经过 _set_variable 写回变量字典，
+            # 因此后面的语句能直接读到前面语句的结果
+            value = constant if code is None else eval(code, TaskEngine._SAFE_GLOBALS, self.variables)
             self._set_variable(var_name, value)
-            local_scope[var_name] = value
             
     def _handle_wait(self, task: Dict[str, Any]):
         """处理等待任务"""
@@ -490,6 +809,7 @@ class TaskEngine:
         x2, y2 = task["x2"], task["y2"]
         duration = task.get("duration", 300)
         success, message = self.adb.swipe(x1, y1, x2, y2, duration)
+        self.img_processor.invalidate()  # 输入后画面可能变化，丢弃旧的匹配结果
         if not success:
             raise Exception(f"滑动操作失败: {message}")
 
@@ -498,13 +818,14 @@ class TaskEngine:
         统一的变量设置方法。
         检查变量是否被监视，并在值变化时打印日志。
         """
-        old_value = self.variables.get(name)
-        # 只有当值确实发生变化时才记录
-        if old_value == value:
+        if name not in self.watched_variables:
+            # 未被监视的变量无需比较旧值，直接写入
+            self.variables[name] = value
             return
 
-        self.variables[name] = value
-        if name in self.watched_variables:
+        # 只有当值确实发生变化时才记录
+        if self.variables.get(name) != value:
+            self.variables[name] = value
             # 使用 print 而不是 self._log，因为这个日志不应受当前任务的 print_log 标志控制
             print(f"监控日志: 变量 '{name}' 的值已更新为: {value}")
             
@@ -531,17 +852,22 @@ class TaskEngine:
                 var_name = value[2:-2].strip()
                 return self.variables.get(var_name) # 使用 .get() 更安全
 
-            # 2. 尝试将字符串转换为数字
+            # 2. 尝试将字符串转换为数字；同一个字符串的转换结果是固定的，缓存后循环中不再重复转换
+            parsed = self._value_cache.get(value)
+            if parsed is not None:
+                return parsed
             try:
                 # 优先尝试整数
-                return int(value)
+                parsed = int(value)
             except ValueError:
                 try:
                     # 再次尝试浮点数
-                    return float(value)
+                    parsed = float(value)
                 except ValueError:
                     # 如果都失败，说明它就是个普通字符串
-                    return value
+                    parsed = value
+            self._value_cache[value] = parsed
+            return parsed
         
         # 如果值本身就不是字符串（例如，在 post_action 中直接通过表达式生成了数字），直接返回
         return value
@@ -551,7 +877,7 @@ class TaskEngine:
         if self.run_start_time is None:
             return "任务尚未运行，无法生成摘要。"
 
-        total_duration = time.time() - self.run_start_time
+        total_duration = time.monotonic() - self.run_start_time
         
         summary = []
         summary.append("--- 任务执行摘要 ---")
@@ -577,7 +903,7 @@ class TaskEngine:
             # 更新成功次数
             self.success_counts[task_desc] = self.success_counts.get(task_desc, 0) + 1
             
-            now = time.time()
+            now = time.monotonic()
             if self.last_success_time is not None:
                 duration = now - self.last_success_time
                 # 使用 print 而不是 self._log，因为这个信息总是需要被看到
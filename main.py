@@ -9,15 +9,26 @@
 import sys
 import os
 import json
-from PyQt5.QtWidgets import QApplication
+from concurrent.futures import ThreadPoolExecutor, wait
+from PyQt5.QtWidgets import QApplication, QSplashScreen
+from PyQt5.QtGui import QPixmap, QColor
+from PyQt5.QtCore import Qt
 
 # 将项目根目录添加到Python路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from core.adb_controller import ADBController
-from core.image_processor import ImageProcessor
-from core.task_engine import TaskEngine
-from ui.main_window import MainWindow
+# 核心模块会导入OpenCV、numpy、pytesseract，耗时较长，
+# 因此在显示启动画面后再于后台线程中导入并初始化
+
+def _create_adb_controller(adb_path, device_addrs, sendevent_tap):
+    """在后台线程中导入并创建ADB控制器"""
+    from core.adb_controller import ADBController
+    return ADBController(adb_path, device_addrs, sendevent_tap=sendevent_tap)
+
+def _create_image_processor(base_dir, tesseract_path):
+    """在后台线程中导入并创建图像处理器"""
+    from core.image_processor import ImageProcessor
+    return ImageProcessor(base_dir=base_dir, tesseract_path=tesseract_path)
 
 def main():
     """主程序入口"""
@@ -42,87 +53,44 @@ def main():
         device_addrs = [device_addrs] if device_addrs else []
 
     tesseract_path = config.get("tesseract_path")
-    adb_controller = ADBController(adb_path, device_addrs)
-    img_processor = ImageProcessor(base_dir=base_dir, tesseract_path=tesseract_path)
-    task_engine = TaskEngine(adb_controller, img_processor, settings=config)
 
-    # 3. 创建GUI应用
+    # 3. 先创建GUI应用并显示启动画面，核心模块在后台初始化
     app = QApplication(sys.argv)
+    splash_pixmap = QPixmap(360, 120)
+    splash_pixmap.fill(QColor("#2c3e50"))
+    splash = QSplashScreen(splash_pixmap)
+    splash.showMessage("正在加载...", Qt.AlignCenter, QColor("#ecf0f1"))
+    splash.show()
+    app.processEvents()
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        adb_future = executor.submit(_create_adb_controller, adb_path, device_addrs,
+                                     config.get("sendevent_tap", False))
+        ip_future = executor.submit(_create_image_processor, base_dir, tesseract_path)
+
+        # 应用QSS样式(样式表单独保存在 ui/style.qss 中)
+        style_path = os.path.join(base_dir, "ui", "style.qss")
+        try:
+            with open(style_path, 'r', encoding='utf-8') as f:
+                app.setStyleSheet(f.read())
+        except OSError as e:
+            print(f"加载样式表失败: {e}")
+
+        # 等待初始化完成，期间保持启动画面响应
+        futures = (adb_future, ip_future)
+        while wait(futures, timeout=0.05).not_done:
+            app.processEvents()
+        adb_controller = adb_future.result()
+        img_processor = ip_future.result()
+
+    from core.task_engine import TaskEngine
+    from ui.main_window import MainWindow
+    task_engine = TaskEngine(adb_controller, img_processor, settings=config)
 
-    # --- 新增：应用酷炫的QSS样式 ---
-    qss_style = """
-        QWidget {
-            background-color: #2c3e50;
-            color: #ecf0f1;
-            font-family: 'Segoe UI', 'Microsoft YaHei', 'Arial';
-            font-size: 10pt;
-        }
-        QMainWindow, QDialog {
-            background-color: #2c3e50;
-        }
-        QTextEdit, QLineEdit, QComboBox {
-            background-color: #34495e;
-            border: 1px solid #566573;
-            border-radius: 4px;
-            padding: 5px;
-        }
-        QTextEdit:focus, QLineEdit:focus, QComboBox:focus {
-            border: 1px solid #5dade2;
-        }
-        QListWidget {
-            background-color: #34495e;
-            border: 1px solid #566573;
-            border-radius: 4px;
-        }
-        QListWidget::item {
-            padding: 8px;
-        }
-        QListWidget::item:selected {
-            background-color: #5a7aa5;
-            color: #ffffff;
-        }
-        QPushButton {
-            background-color: #5dade2;
-            color: #ffffff;
-            border: none;
-            border-radius: 4px;
-            padding: 8px 16px;
-            min-width: 80px;
-        }
-        QPushButton:hover {
-            background-color: #85c1e9;
-        }
-        QPushButton:pressed {
-            background-color: #3498db;
-        }
-        QPushButton:disabled {
-            background-color: #566573;
-            color: #99a3a4;
-        }
-        QLabel {
-            color: #ecf0f1;
-        }
-        QProgressBar {
-            border: 1px solid #566573;
-            border-radius: 4px;
-            text-align: center;
-            color: #ecf0f1;
-        }
-        QProgressBar::chunk {
-            background-color: #5dade2;
-            border-radius: 3px;
-        }
-        QToolTip {
-            background-color: #34495e;
-            color: #ecf0f1;
-            border: 1px solid #566573;
-        }
-    """
-    app.setStyleSheet(qss_style)
-    
     # 4. 创建主窗口，并传入依赖
     window = MainWindow(task_engine, adb_controller, img_processor)
     window.show()
+    splash.finish(window)
 
     # 5. 运行应用
     sys.exit(app.exec_())
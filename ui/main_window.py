@@ -7,28 +7,81 @@
 """
 
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                            QPushButton, QListWidget, QTextEdit, QLabel,
+                            QPushButton, QListView, QTextEdit, QLabel,
                             QComboBox, QProgressBar, QDialog, QFormLayout,
                             QLineEdit, QDialogButtonBox, QInputDialog, QMessageBox,
                             QFileDialog, QStackedWidget, QApplication,QCheckBox, QMenu,
                             QGroupBox, QTimeEdit)
-from PyQt5.QtGui import QKeySequence, QIntValidator, QDoubleValidator, QColor
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTime, QTimer
+from PyQt5.QtGui import QKeySequence, QIntValidator, QDoubleValidator, QColor, QImageWriter
+from PyQt5.QtCore import (Qt, QThread, pyqtSignal, pyqtSlot, QTime, QTimer, QPoint,
+                          QAbstractListModel, QModelIndex, QStringListModel, QSignalBlocker)
+import ast
 import datetime
+import functools
+import itertools
+import keyword
 import os
+import queue
+import subprocess
+import time
 import json
+import threading
 from core.task_engine import TaskEngine
 from core.adb_controller import ADBController
 
+# 可选的 orjson 解析大型任务文件比标准库json快数倍
+try:
+    import orjson
+    _HAS_ORJSON = True
+except ImportError:
+    _HAS_ORJSON = False
+
+# 程序根目录及其下的各个目录，只在导入时计算一次
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_CONFIG_DIR = os.path.join(_BASE_DIR, "config")
+_SETTINGS_PATH = os.path.join(_CONFIG_DIR, "settings.json")
+_SCREENSHOTS_DIR = os.path.join(_BASE_DIR, "screenshots")
+# 粘贴的图片统一保存到templates
+_TEMPLATES_DIR = os.path.join(_BASE_DIR, "templates")
+# 修改后需要重新检测设备 / 重新安排定时任务的设置项
+_DEVICE_SETTING_KEYS = ("adb_path", "device_addrs")
+_TIMER_SETTING_KEYS = ("timer_enabled", "timer_time", "timer_action")
+# (校验器类型, 构造参数) -> 共用的校验器实例
+_VALIDATORS = {}
+# 已通过验证的 (表达式类型, 表达式)，重复保存同一脚本时不再重新解析
+_VALID_EXPRESSIONS = set()
+# 已确认合法的变量名
+_VALID_IDENTIFIERS = set()
+
+def _is_identifier(name: str) -> bool:
+    """变量名是否合法：Python标识符且不是关键字，合法的名字会被缓存"""
+    if name in _VALID_IDENTIFIERS:
+        return True
+    if name.isidentifier() and not keyword.iskeyword(name):
+        _VALID_IDENTIFIERS.add(name)
+        return True
+    return False
+
+def _shared_validator(cls, *args):
+    """返回共用的校验器实例，相同类型和范围的输入框共用一个，不随对话框重复创建"""
+    key = (cls, args)
+    validator = _VALIDATORS.get(key)
+    if validator is None:
+        validator = _VALIDATORS[key] = cls(*args)
+    return validator
+
+def _int_validator() -> QIntValidator:
+    """不限范围的整数校验器"""
+    return _shared_validator(QIntValidator)
+
 class ImagePasteLineEdit(QLineEdit):
     """支持粘贴图片的行编辑器"""
+    templates_dir = _TEMPLATES_DIR
+    # 所有输入框共用的序号，同一秒内多次粘贴也不会覆盖
+    _counter = itertools.count(1)
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        # 获取主脚本的绝对路径的目录
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self.templates_dir = os.path.join(base_dir, "templates")
-        if not os.path.exists(self.templates_dir):
-            os.makedirs(self.templates_dir)
 
     def keyPressEvent(self, event):
         """重写按键事件，拦截Ctrl+V"""
@@ -45,27 +98,30 @@ class ImagePasteLineEdit(QLineEdit):
     def save_image_from_clipboard(self, image):
         """将剪贴板的图片保存到文件"""
         try:
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"paste_{timestamp}.png"
+            # 目录在第一次粘贴时才创建，打开对话框时不再访问磁盘
+            os.makedirs(self.templates_dir, exist_ok=True)
+            ts = time.strftime("%Y%m%d_%H%M%S")
+            filename = f"paste_{ts}_{next(self._counter)}.png"
             save_path = os.path.join(self.templates_dir, filename)
             
             # 使用相对路径以提高可移植性
             relative_path = os.path.join("templates", filename)
 
-            if image.save(save_path, "PNG"):
+            # 模板只用于匹配，用最低压缩级别保存，编码速度约为默认级别的两倍
+            writer = QImageWriter(save_path, b"png")
+            writer.setCompression(1)
+            if writer.write(image):
                 self.setText(relative_path)
                 print(f"图片已从剪贴板保存到: {save_path}")
             else:
-                print("从剪贴板保存图片失败")
+                print(f"从剪贴板保存图片失败: {writer.errorString()}")
         except Exception as e:
             print(f"保存剪贴板图片时出错: {e}")
 
 class TaskEditDialog(QDialog):
-    """任务编辑对话框"""
+    """任务编辑对话框，可以通过 load() 重复用于编辑不同的任务"""
     def __init__(self, task=None, parent=None):
         super().__init__(parent)
-        self.task = task or {"type": "click", "description": "新任务"}
-        self.setWindowTitle(f"编辑任务 - {self.task['type']}")
 
         # 主布局
         self.main_layout = QVBoxLayout(self)
@@ -74,22 +130,18 @@ class TaskEditDialog(QDialog):
         # 通用字段
         self.type_combo = QComboBox()
         self.type_combo.addItems(["click", "long_press", "screenshot", "wait", "set_variable", "swipe", "ocr", "find_and_click_one", "restart_app", "LOOP", "END_LOOP"])
-        self.desc_edit = QLineEdit(self.task.get("description", ""))
+        self.desc_edit = QLineEdit()
         self.wait_for_success_check = QCheckBox("等待执行成功 (阻塞模式)")
         self.wait_for_success_check.setToolTip("勾选后，此任务会一直重试直到成功，才会执行下一个任务。")
-        self.wait_for_success_check.setChecked(self.task.get("wait_for_success", False))
         
         self.continue_on_fail_check = QCheckBox("失败时继续")
         self.continue_on_fail_check.setToolTip("勾选后，如果此任务执行失败（且非阻塞），将继续执行下一个任务。")
-        self.continue_on_fail_check.setChecked(self.task.get("continue_on_fail", False))
         
         self.print_log_check = QCheckBox("打印此任务的日志")
         self.print_log_check.setToolTip("勾选后，此任务执行时将打印详细日志。")
-        self.print_log_check.setChecked(self.task.get("print_log", False))
         
         self.timer_check = QCheckBox("计时")
         self.timer_check.setToolTip("勾选后，任务成功时将计算与上个任务成功时的时间差。")
-        self.timer_check.setChecked(self.task.get("enable_timer", False))
 
         options_layout = QHBoxLayout()
         options_layout.addWidget(self.wait_for_success_check)
@@ -103,49 +155,54 @@ class TaskEditDialog(QDialog):
 
         # 阻塞任务的超时设置
         self.timeout_label = QLabel("阻塞超时(秒):")
-        self.timeout_edit = QLineEdit(str(self.task.get("timeout", "")))
+        self.timeout_edit = QLineEdit()
         self.timeout_edit.setPlaceholderText("留空则无限等待")
-        self.timeout_edit.setValidator(QIntValidator(1, 9999))
+        self.timeout_edit.setValidator(_shared_validator(QIntValidator, 1, 9999))
         self.form_layout.addRow(self.timeout_label, self.timeout_edit)
 
         # --- 新增：执行条件 ---
         self.pre_cond_combo = QComboBox()
         self.pre_cond_combo.addItems(["无", "变量"])
-        self.pre_cond_edit = QLineEdit(self.task.get("pre_condition", ""))
-        self.form_layout.addRow("执行条件:", self.pre_cond_combo)
-        self.form_layout.addRow("条件表达式:", self.pre_cond_edit)
+        self.pre_cond_edit = QLineEdit()
+        self.cond_combo_label = QLabel("执行条件:")
+        self.pre_cond_label = QLabel("条件表达式:")
+        self.form_layout.addRow(self.cond_combo_label, self.pre_cond_combo)
+        self.form_layout.addRow(self.pre_cond_label, self.pre_cond_edit)
 
         # --- 新增：执行后动作 ---
         self.post_action_combo = QComboBox()
         self.post_action_combo.addItems(["无", "变量"])
-        self.post_action_edit = QLineEdit(self.task.get("post_action", ""))
+        self.post_action_edit = QLineEdit()
+        self.post_action_label = QLabel("动作表达式:")
         self.form_layout.addRow("执行后动作:", self.post_action_combo)
-        self.form_layout.addRow("动作表达式:", self.post_action_edit)
+        self.form_layout.addRow(self.post_action_label, self.post_action_edit)
 
         # --- 新增：失败时动作 ---
         self.fail_action_combo = QComboBox()
         self.fail_action_combo.addItems(["无", "变量"])
-        self.fail_action_edit = QLineEdit(self.task.get("on_fail_action", ""))
+        self.fail_action_edit = QLineEdit()
+        self.fail_action_label = QLabel("失败动作表达式:")
         self.form_layout.addRow("失败时动作:", self.fail_action_combo)
-        self.form_layout.addRow("失败动作表达式:", self.fail_action_edit)
+        self.form_layout.addRow(self.fail_action_label, self.fail_action_edit)
 
         self.main_layout.addLayout(self.form_layout)
 
-        # 根据初始值设置可见性
-        self.pre_cond_edit.setVisible(self.task.get("pre_condition") is not None)
-        self.post_action_edit.setVisible(self.task.get("post_action") is not None)
-        self.fail_action_edit.setVisible(self.task.get("on_fail_action") is not None)
-        if self.task.get("pre_condition"):
-            self.pre_cond_combo.setCurrentText("变量")
-        if self.task.get("post_action"):
-            self.post_action_combo.setCurrentText("变量")
-        if self.task.get("on_fail_action"):
-            self.fail_action_combo.setCurrentText("变量")
-
         # 动态参数区域
         self.stacked_widget = QStackedWidget()
         self.main_layout.addWidget(self.stacked_widget)
-        self.setup_task_widgets()
+        # 任务类型 -> 参数控件的构建函数；控件在首次切换到该类型时才创建
+        self._widget_builders = {
+            "click": self._build_click_widget,
+            "screenshot": self._build_screenshot_widget,
+            "wait": self._build_wait_widget,
+            "set_variable": self._build_variable_widget,
+            "swipe": self._build_swipe_widget,
+            "long_press": self._build_long_press_widget,
+            "restart_app": self._build_restart_app_widget,
+            "ocr": self._build_ocr_widget,
+            "find_and_click_one": self._build_find_one_widget,
+        }
+        self._task_widgets = {}  # 已创建的参数控件
 
         # 确认按钮
         buttons = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Cancel)
@@ -160,28 +217,66 @@ class TaskEditDialog(QDialog):
         self.fail_action_combo.currentIndexChanged.connect(self.toggle_fail_action_edit)
         self.wait_for_success_check.stateChanged.connect(self.toggle_timeout_edit)
 
+        self.load(task)
+
+    def load(self, task=None):
+        """
+        用任务填充对话框，不传入任务时为新建任务
+        通用字段原地重新填充；上一个任务的参数控件被丢弃，切换到对应类型时按新任务重新创建
+        """
+        self.task = task or {"type": "click", "description": "新任务"}
+
+        for widget in self._task_widgets.values():
+            self.stacked_widget.removeWidget(widget)
+            widget.deleteLater()
+        self._task_widgets = {}
+
+        # 填充时不触发各控件的槽函数，最后统一刷新一次可见性
+        with QSignalBlocker(self.type_combo), QSignalBlocker(self.wait_for_success_check), \
+                QSignalBlocker(self.pre_cond_combo), QSignalBlocker(self.post_action_combo), \
+                QSignalBlocker(self.fail_action_combo):
+            self.type_combo.setCurrentText(self.task["type"])
+            self.desc_edit.setText(self.task.get("description", ""))
+            self.wait_for_success_check.setChecked(self.task.get("wait_for_success", False))
+            self.continue_on_fail_check.setChecked(self.task.get("continue_on_fail", False))
+            self.print_log_check.setChecked(self.task.get("print_log", False))
+            self.timer_check.setChecked(self.task.get("enable_timer", False))
+            self.timeout_edit.setText(self._field_text("timeout"))
+            for key, combo, edit in (("pre_condition", self.pre_cond_combo, self.pre_cond_edit),
+                                     ("post_action", self.post_action_combo, self.post_action_edit),
+                                     ("on_fail_action", self.fail_action_combo, self.fail_action_edit)):
+                expression = self.task.get(key) or ""
+                edit.setText(expression)
+                combo.setCurrentText("变量" if expression else "无")
 
-        self.type_combo.setCurrentText(self.task["type"])
         self.update_form()
         self.toggle_condition_edit()
         self.toggle_action_edit()
         self.toggle_fail_action_edit()
         self.toggle_timeout_edit()
 
-    def setup_task_widgets(self):
-        """为每种任务类型创建独立的参数设置控件"""
-        # 点击任务
+    def _field_text(self, key: str, default: str = "") -> str:
+        """任务字段值的显示文本，字段不存在或为None时返回默认值"""
+        value = self.task.get(key)
+        return default if value is None else str(value)
+
+    def _edit_for(self, key: str, default: str = "") -> QLineEdit:
+        """创建显示任务字段值的输入框，字段不存在或为None时显示默认值"""
+        return QLineEdit(self._field_text(key, default))
+
+    def _build_click_widget(self) -> QWidget:
+        """点击任务的参数控件"""
         self.click_widget = QWidget()
         click_layout = QFormLayout(self.click_widget)
-        self.click_x = QLineEdit(str(self.task.get("x")) if self.task.get("x") is not None else "")
-        self.click_x.setValidator(QIntValidator())
-        self.click_y = QLineEdit(str(self.task.get("y")) if self.task.get("y") is not None else "")
-        self.click_y.setValidator(QIntValidator())
+        self.click_x = self._edit_for("x")
+        self.click_x.setValidator(_int_validator())
+        self.click_y = self._edit_for("y")
+        self.click_y.setValidator(_int_validator())
         self.click_target_text = QLineEdit(self.task.get("target_text", ""))
         self.click_target_image = ImagePasteLineEdit(self.task.get("target", ""))
         self.click_target_image.setPlaceholderText("可浏览文件或直接粘贴图片")
         browse_btn = QPushButton("浏览...")
-        browse_btn.clicked.connect(lambda: self.browse_file(self.click_target_image))
+        browse_btn.clicked.connect(functools.partial(self.browse_file, self.click_target_image))
         
         click_layout.addRow("目标文字(优先):", self.click_target_text)
         
@@ -190,100 +285,117 @@ class TaskEditDialog(QDialog):
         target_layout.addWidget(browse_btn)
         click_layout.addRow("目标图片(次选):", target_layout)
 
+        self.click_roi = QLineEdit(",".join(map(str, self.task.get("roi", []))))
+        self.click_roi.setPlaceholderText("可选, 格式: x,y,宽,高，只在该区域内识别")
+        click_layout.addRow("识别区域(可选):", self.click_roi)
+
         click_layout.addRow("X坐标(备用):", self.click_x)
         click_layout.addRow("Y坐标(备用):", self.click_y)
-        self.stacked_widget.addWidget(self.click_widget)
+        return self.click_widget
 
-        # 截图任务
+    def _build_screenshot_widget(self) -> QWidget:
+        """截图任务的参数控件"""
         self.screenshot_widget = QWidget()
         ss_layout = QFormLayout(self.screenshot_widget)
         self.ss_path = QLineEdit(self.task.get("save_path", "screenshots/capture.png"))
         browse_btn = QPushButton("选择路径...")
-        browse_btn.clicked.connect(lambda: self.browse_save_path(self.ss_path))
+        browse_btn.clicked.connect(functools.partial(self.browse_save_path, self.ss_path))
         path_layout = QHBoxLayout()
         path_layout.addWidget(self.ss_path)
         path_layout.addWidget(browse_btn)
         ss_layout.addRow("保存路径:", path_layout)
-        self.stacked_widget.addWidget(self.screenshot_widget)
+        return self.screenshot_widget
 
-        # 等待任务
+    def _build_wait_widget(self) -> QWidget:
+        """等待任务的参数控件"""
         self.wait_widget = QWidget()
         wait_layout = QFormLayout(self.wait_widget)
-        self.wait_duration = QLineEdit(str(self.task.get("duration", "1")))
-        self.wait_duration.setValidator(QDoubleValidator(0, 9999, 2))
+        self.wait_duration = self._edit_for("duration", "1")
+        self.wait_duration.setValidator(_shared_validator(QDoubleValidator, 0, 9999, 2))
         wait_layout.addRow("等待时间(秒):", self.wait_duration)
-        self.stacked_widget.addWidget(self.wait_widget)
+        return self.wait_widget
 
-        # 设置变量任务
+    def _build_variable_widget(self) -> QWidget:
+        """设置变量任务的参数控件"""
         self.variable_widget = QWidget()
         var_layout = QFormLayout(self.variable_widget)
         self.var_name = QLineEdit(self.task.get("name", ""))
-        self.var_value = QLineEdit(str(self.task.get("value", "")))
+        self.var_value = self._edit_for("value")
         var_layout.addRow("变量名:", self.var_name)
         var_layout.addRow("变量值:", self.var_value)
-        self.stacked_widget.addWidget(self.variable_widget)
+        return self.variable_widget
 
-        # 滑动任务
+    def _build_swipe_widget(self) -> QWidget:
+        """滑动任务的参数控件"""
         self.swipe_widget = QWidget()
         swipe_layout = QFormLayout(self.swipe_widget)
-        self.swipe_x1 = QLineEdit(str(self.task.get("x1")) if self.task.get("x1") is not None else "")
-        self.swipe_x1.setValidator(QIntValidator())
-        self.swipe_y1 = QLineEdit(str(self.task.get("y1")) if self.task.get("y1") is not None else "")
-        self.swipe_y1.setValidator(QIntValidator())
-        self.swipe_x2 = QLineEdit(str(self.task.get("x2")) if self.task.get("x2") is not None else "")
-        self.swipe_x2.setValidator(QIntValidator())
-        self.swipe_y2 = QLineEdit(str(self.task.get("y2")) if self.task.get("y2") is not None else "")
-        self.swipe_y2.setValidator(QIntValidator())
-        self.swipe_duration = QLineEdit(str(self.task.get("duration", "300")))
-        self.swipe_duration.setValidator(QIntValidator())
+        self.swipe_x1 = self._edit_for("x1")
+        self.swipe_x1.setValidator(_int_validator())
+        self.swipe_y1 = self._edit_for("y1")
+        self.swipe_y1.setValidator(_int_validator())
+        self.swipe_x2 = self._edit_for("x2")
+        self.swipe_x2.setValidator(_int_validator())
+        self.swipe_y2 = self._edit_for("y2")
+        self.swipe_y2.setValidator(_int_validator())
+        self.swipe_duration = self._edit_for("duration", "300")
+        self.swipe_duration.setValidator(_int_validator())
         swipe_layout.addRow("起始X:", self.swipe_x1)
         swipe_layout.addRow("起始Y:", self.swipe_y1)
         swipe_layout.addRow("结束X:", self.swipe_x2)
         swipe_layout.addRow("结束Y:", self.swipe_y2)
         swipe_layout.addRow("持续时间(ms):", self.swipe_duration)
-        self.stacked_widget.addWidget(self.swipe_widget)
+        return self.swipe_widget
 
-        # 长按任务
+    def _build_long_press_widget(self) -> QWidget:
+        """长按任务的参数控件"""
         self.long_press_widget = QWidget()
         long_press_layout = QFormLayout(self.long_press_widget)
-        self.long_press_x = QLineEdit(str(self.task.get("x")) if self.task.get("x") is not None else "")
-        self.long_press_x.setValidator(QIntValidator())
-        self.long_press_y = QLineEdit(str(self.task.get("y")) if self.task.get("y") is not None else "")
-        self.long_press_y.setValidator(QIntValidator())
-        self.long_press_duration = QLineEdit(str(self.task.get("duration", "1000")))
-        self.long_press_duration.setValidator(QIntValidator())
+        self.long_press_x = self._edit_for("x")
+        self.long_press_x.setValidator(_int_validator())
+        self.long_press_y = self._edit_for("y")
+        self.long_press_y.setValidator(_int_validator())
+        self.long_press_duration = self._edit_for("duration", "1000")
+        self.long_press_duration.setValidator(_int_validator())
         long_press_layout.addRow("X坐标:", self.long_press_x)
         long_press_layout.addRow("Y坐标:", self.long_press_y)
         long_press_layout.addRow("持续时间(ms):", self.long_press_duration)
-        self.stacked_widget.addWidget(self.long_press_widget)
+        return self.long_press_widget
 
-        # 重启应用任务
+    def _build_restart_app_widget(self) -> QWidget:
+        """重启应用任务的参数控件"""
         self.restart_app_widget = QWidget()
         restart_app_layout = QFormLayout(self.restart_app_widget)
         self.restart_app_package = QLineEdit(self.task.get("package_name", ""))
         self.restart_app_package.setPlaceholderText("例如: com.android.settings")
         restart_app_layout.addRow("应用包名:", self.restart_app_package)
-        self.stacked_widget.addWidget(self.restart_app_widget)
+        return self.restart_app_widget
 
-        # OCR任务
+    def _build_ocr_widget(self) -> QWidget:
+        """OCR任务的参数控件"""
         self.ocr_widget = QWidget()
         ocr_layout = QFormLayout(self.ocr_widget)
         self.ocr_area = QLineEdit(",".join(map(str, self.task.get("area", []))))
         self.ocr_area.setPlaceholderText("可选, 格式: x1,y1,x2,y2")
         self.ocr_variable = QLineEdit(self.task.get("variable_name", ""))
         self.ocr_lang = QLineEdit(self.task.get("lang", "chi_sim+eng"))
+        self.ocr_psm = self._edit_for("psm")
+        self.ocr_psm.setPlaceholderText("可选, 如 6 表示单一文本块，可跳过版面分析")
         ocr_layout.addRow("识别区域(可选):", self.ocr_area)
         ocr_layout.addRow("存入变量名:", self.ocr_variable)
         ocr_layout.addRow("识别语言:", self.ocr_lang)
-        self.stacked_widget.addWidget(self.ocr_widget)
+        ocr_layout.addRow("页面分割模式(可选):", self.ocr_psm)
+        return self.ocr_widget
 
-        # Find and Click One Task
+    def _build_find_one_widget(self) -> QWidget:
+        """查找并点击其一任务的参数控件"""
         self.find_one_widget = QWidget()
         find_one_layout = QVBoxLayout(self.find_one_widget)
         find_one_layout.addWidget(QLabel("目标图片列表 (按顺序查找):"))
-        self.find_one_list = QListWidget()
-        if self.task.get("type") == "find_and_click_one":
-            self.find_one_list.addItems(self.task.get("targets", []))
+        self.find_one_list = QListView()
+        self.find_one_list.setSelectionMode(QListView.ExtendedSelection)
+        self.find_one_model = QStringListModel(
+            list(self.task.get("targets", [])) if self.task.get("type") == "find_and_click_one" else [])
+        self.find_one_list.setModel(self.find_one_model)
         
         find_one_btn_layout = QHBoxLayout()
         add_btn = QPushButton("添加...")
@@ -296,59 +408,75 @@ class TaskEditDialog(QDialog):
         find_one_layout.addWidget(self.find_one_list)
         find_one_layout.addLayout(find_one_btn_layout)
 
+        find_one_roi_layout = QFormLayout()
+        self.find_one_roi = QLineEdit(",".join(map(str, self.task.get("roi", []))))
+        self.find_one_roi.setPlaceholderText("可选, 格式: x,y,宽,高，只在该区域内查找")
+        find_one_roi_layout.addRow("识别区域(可选):", self.find_one_roi)
+        find_one_layout.addLayout(find_one_roi_layout)
+
         # 新增：仅判断复选框
         self.find_one_judge_only_check = QCheckBox("仅判断 (成功后不点击)")
         self.find_one_judge_only_check.setToolTip("勾选后，匹配成功将只执行“执行后动作”（如果有），而不进行点击。")
         self.find_one_judge_only_check.setChecked(self.task.get("judge_only", False))
         find_one_layout.addWidget(self.find_one_judge_only_check)
-
-        self.stacked_widget.addWidget(self.find_one_widget)
-
+        return self.find_one_widget
+
+    @staticmethod
+    def _parse_region(text: str) -> list:
+        """解析由4个整数组成的区域，格式错误时返回空列表"""
+        text = text.strip()
+        if not text:
+            return []
+        try:
+            region = [int(x.strip()) for x in text.split(',')]
+            if len(region) != 4:
+                raise ValueError("区域必须包含4个整数")
+        except ValueError as e:
+            print(f"无效的区域格式: {e}")
+            return []  # 格式错误则忽略
+        return region
+
+    @pyqtSlot()
     def _add_image_to_list(self):
-        """为find_one_list添加图片路径"""
-        path, _ = QFileDialog.getOpenFileName(self, "选择图片", "", "图片文件 (*.png *.jpg *.bmp)")
-        if path:
-            self.find_one_list.addItem(path)
-
+        """为find_one_list添加图片路径，可一次选择多张"""
+        paths, _ = QFileDialog.getOpenFileNames(self, "选择图片", "", "图片文件 (*.png *.jpg *.bmp)")
+        if paths:
+            # 一次插入所有行，视图只重新布局一次
+            row = self.find_one_model.rowCount()
+            self.find_one_model.insertRows(row, len(paths))
+            for offset, path in enumerate(paths):
+                self.find_one_model.setData(self.find_one_model.index(row + offset), path)
+
+    @pyqtSlot()
     def _remove_image_from_list(self):
         """从find_one_list移除选中图片"""
-        for item in self.find_one_list.selectedItems():
-            self.find_one_list.takeItem(self.find_one_list.row(item))
+        # 从后往前删除，避免前面的删除改变后面的行号
+        rows = sorted((index.row() for index in self.find_one_list.selectedIndexes()), reverse=True)
+        for row in rows:
+            self.find_one_model.removeRows(row, 1)
 
-    def update_form(self):
+    @pyqtSlot(int)
+    def update_form(self, _index=0):
         """根据任务类型切换显示的控件"""
         task_type = self.type_combo.currentText()
         self.setWindowTitle(f"编辑任务 - {task_type}")
 
         # 根据任务类型调整“执行条件”的标签
-        cond_label = self.form_layout.labelForField(self.pre_cond_combo)
-        if cond_label:
-            if task_type == "END_LOOP":
-                cond_label.setText("停止条件(满足则停):")
-            else:
-                cond_label.setText("执行条件(满足才执行):")
+        if task_type == "END_LOOP":
+            self.cond_combo_label.setText("停止条件(满足则停):")
+        else:
+            self.cond_combo_label.setText("执行条件(满足才执行):")
         
         is_param_task = task_type not in ["LOOP", "END_LOOP"]
         self.stacked_widget.setVisible(is_param_task)
 
-        if task_type == "click":
-            self.stacked_widget.setCurrentWidget(self.click_widget)
-        elif task_type == "screenshot":
-            self.stacked_widget.setCurrentWidget(self.screenshot_widget)
-        elif task_type == "wait":
-            self.stacked_widget.setCurrentWidget(self.wait_widget)
-        elif task_type == "set_variable":
-            self.stacked_widget.setCurrentWidget(self.variable_widget)
-        elif task_type == "swipe":
-            self.stacked_widget.setCurrentWidget(self.swipe_widget)
-        elif task_type == "ocr":
-            self.stacked_widget.setCurrentWidget(self.ocr_widget)
-        elif task_type == "find_and_click_one":
-            self.stacked_widget.setCurrentWidget(self.find_one_widget)
-        elif task_type == "long_press":
-            self.stacked_widget.setCurrentWidget(self.long_press_widget)
-        elif task_type == "restart_app":
-            self.stacked_widget.setCurrentWidget(self.restart_app_widget)
+        builder = self._widget_builders.get(task_type)
+        if builder is not None:
+            widget = self._task_widgets.get(task_type)
+            if widget is None:
+                widget = self._task_widgets[task_type] = builder()
+                self.stacked_widget.addWidget(widget)
+            self.stacked_widget.setCurrentWidget(widget)
 
     def browse_file(self, line_edit):
         """浏览文件对话框"""
@@ -362,25 +490,29 @@ class TaskEditDialog(QDialog):
         if path:
             line_edit.setText(path)
 
-    def toggle_condition_edit(self):
+    @pyqtSlot(int)
+    def toggle_condition_edit(self, _index=0):
         """切换条件输入框的可见性"""
         is_variable = self.pre_cond_combo.currentText() == "变量"
         self.pre_cond_edit.setVisible(is_variable)
-        self.form_layout.labelForField(self.pre_cond_edit).setVisible(is_variable)
+        self.pre_cond_label.setVisible(is_variable)
 
-    def toggle_action_edit(self):
+    @pyqtSlot(int)
+    def toggle_action_edit(self, _index=0):
         """切换动作输入框的可见性"""
         is_variable = self.post_action_combo.currentText() == "变量"
         self.post_action_edit.setVisible(is_variable)
-        self.form_layout.labelForField(self.post_action_edit).setVisible(is_variable)
+        self.post_action_label.setVisible(is_variable)
 
-    def toggle_fail_action_edit(self):
+    @pyqtSlot(int)
+    def toggle_fail_action_edit(self, _index=0):
         """切换失败时动作输入框的可见性"""
         is_variable = self.fail_action_combo.currentText() == "变量"
         self.fail_action_edit.setVisible(is_variable)
-        self.form_layout.labelForField(self.fail_action_edit).setVisible(is_variable)
+        self.fail_action_label.setVisible(is_variable)
 
-    def toggle_timeout_edit(self):
+    @pyqtSlot(int)
+    def toggle_timeout_edit(self, _state=0):
         """根据是否为阻塞任务，切换超时输入框的可见性"""
         is_blocking = self.wait_for_success_check.isChecked()
         self.timeout_label.setVisible(is_blocking)
@@ -420,6 +552,9 @@ class TaskEditDialog(QDialog):
                 "x": int(self.click_x.text()) if self.click_x.text() else None,
                 "y": int(self.click_y.text()) if self.click_y.text() else None
             })
+            roi = self._parse_region(self.click_roi.text())
+            if roi:
+                task["roi"] = roi
         elif task_type == "screenshot":
             task["save_path"] = self.ss_path.text()
         elif task_type == "wait":
@@ -438,28 +573,19 @@ class TaskEditDialog(QDialog):
                 "duration": int(self.swipe_duration.text()) if self.swipe_duration.text() else 300
             })
         elif task_type == "ocr":
-            area_text = self.ocr_area.text().strip()
-            area = []
-            if area_text:
-                try:
-                    area = [int(x.strip()) for x in area_text.split(',')]
-                    if len(area) != 4:
-                        raise ValueError("区域必须包含4个整数")
-                except ValueError as e:
-                    # 可以在这里弹出一个警告
-                    print(f"无效的区域格式: {e}")
-                    area = [] # 格式错误则忽略
             task.update({
-                "area": area,
+                "area": self._parse_region(self.ocr_area.text()),
                 "variable_name": self.ocr_variable.text(),
                 "lang": self.ocr_lang.text()
             })
+            if self.ocr_psm.text().strip().isdigit():
+                task["psm"] = int(self.ocr_psm.text().strip())
         elif task_type == "find_and_click_one":
-            items = []
-            for i in range(self.find_one_list.count()):
-                items.append(self.find_one_list.item(i).text())
-            task["targets"] = items
+            task["targets"] = self.find_one_model.stringList()
             task["judge_only"] = self.find_one_judge_only_check.isChecked()
+            roi = self._parse_region(self.find_one_roi.text())
+            if roi:
+                task["roi"] = roi
         elif task_type == "long_press":
             task.update({
                 "x": int(self.long_press_x.text()) if self.long_press_x.text() else None,
@@ -473,8 +599,6 @@ class TaskEditDialog(QDialog):
 
     def accept(self):
         """在保存前验证表达式"""
-        import re
-
         # 1. 验证条件表达式
         if self.pre_cond_combo.currentText() == "变量":
             pre_cond_expr = self.pre_cond_edit.text()
@@ -505,8 +629,8 @@ class TaskEditDialog(QDialog):
         # 4. 验证 'set_variable' 任务的变量名
         if self.type_combo.currentText() == "set_variable":
             var_name = self.var_name.text()
-            if not var_name.isidentifier():
-                 QMessageBox.warning(self, "变量名错误", "变量名必须是有效的Python标识符（例如，'my_var'，不能以数字开头，不能包含空格或特殊字符）。")
+            if not _is_identifier(var_name):
+                 QMessageBox.warning(self, "变量名错误", "变量名必须是有效的Python标识符（例如，'my_var'，不能以数字开头，不能包含空格或特殊字符，也不能是Python关键字）。")
                  return
         
         super().accept()
@@ -517,45 +641,32 @@ class TaskEditDialog(QDialog):
         expr_type: 'condition' 或 'action'
         返回 (is_valid, error_message)
         """
-        import re
-        
+        if (expr_type, expression) in _VALID_EXPRESSIONS:
+            return True, ""
+
         guidance = ""
         try:
             if expr_type == 'condition':
                 guidance = "条件表达式指南:\n- 使用 `变量名 == 值` 进行比较 (例如, `count == 5`)。\n- 支持的逻辑运算符: `&&` (与), `||` (或), `!` (非)。\n- 支持的比较运算符: `==`, `!=`, `>`, `<`, `>=`, `<=`。\n- 多个条件可以用分号 `;` 分隔，所有条件都必须满足。"
                 
-                # 模拟 task_engine 的处理方式
-                processed_expr = expression.replace("&&", " and ").replace("||", " or ").replace("!", " not ")
-                processed_expr = re.sub(r'(?<![=<>!])=(?![=])', '==', processed_expr)
-                
-                conditions = [cond.strip() for cond in processed_expr.split(';')]
-                for cond in conditions:
-                    if not cond: continue
-                    # 尝试编译，检查语法错误
-                    compile(cond, '<string>', 'eval')
+                # 与 task_engine 使用相同的转换方式
+                for cond in TaskEngine._normalize_conditions(expression):
+                    # 尝试解析，检查语法错误和不支持的写法
+                    TaskEngine._check_expression(ast.parse(cond, '<string>', 'eval'))
                 
+                _VALID_EXPRESSIONS.add((expr_type, expression))
                 return True, ""
 
             elif expr_type == 'action':
                 guidance = "动作表达式指南:\n- 使用 `变量名 = 表达式` 格式 (例如, `count = count + 1`)。\n- 表达式可以是数字、字符串(用引号)或其他变量。\n- 多个赋值语句可以用分号 `;` 分隔。"
 
-                statements = [stmt.strip() for stmt in expression.split(';')]
-                for stmt in statements:
-                    if not stmt: continue
-                    
-                    # 检查赋值语句是否合法
-                    parts = stmt.split('=', 1)
-                    if len(parts) != 2:
-                         raise ValueError("赋值语句必须包含一个等号。")
-                    
-                    var_name, expr = [s.strip() for s in parts]
-                    
-                    if not var_name.isidentifier():
-                        raise NameError(f"无效的变量名: '{var_name}'。变量名只能包含字母、数字和下划线，且不能以数字开头。")
-                    
-                    # 检查表达式是否可编译
-                    compile(expr, '<string>', 'eval')
+                # 与 task_engine 使用相同的解析方式，所有语句一次解析完成
+                # 左侧不是合法变量名时会抛出 NameError
+                for _, _, value in TaskEngine._parse_action(expression):
+                    # 检查表达式是否只使用支持的写法
+                    TaskEngine._check_expression(value)
 
+                _VALID_EXPRESSIONS.add((expr_type, expression))
                 return True, ""
 
         except Exception as e:
@@ -574,10 +685,15 @@ class Worker(QThread):
         super().__init__()
         self.task_engine = task_engine
         self.is_running = True
+        # 进度合并：界面线程还没处理上一次进度时不再发送新的信号，只记录最新值，
+        # 避免任务执行很快时大量跨线程事件堆积在界面的事件队列中
+        self._progress_lock = threading.Lock()
+        self._latest_progress = None
+        self._progress_pending = False
 
     def run(self):
         try:
-            self.task_engine.run(self.progress.emit, lambda: self.is_running)
+            self.task_engine.run(self._report_progress, lambda: self.is_running)
             if self.is_running:
                 self.finished.emit("所有任务执行完成")
             else:
@@ -589,10 +705,272 @@ class Worker(QThread):
         self.is_running = False
         self.task_engine.stop()
 
+    def _report_progress(self, current, total):
+        """任务引擎的进度回调(工作线程中调用)"""
+        with self._progress_lock:
+            self._latest_progress = (current, total)
+            if self._progress_pending:
+                return
+            self._progress_pending = True
+        self.progress.emit(current, total)
+
+    def take_progress(self):
+        """取出最新的进度(界面线程中调用)，之后的进度变化会重新发送信号"""
+        with self._progress_lock:
+            self._progress_pending = False
+            return self._latest_progress
+
 
 from core.image_processor import ImageProcessor
 
+class _TaskFields(dict):
+    """格式化任务信息时使用，缺少的字段显示为 '?'"""
+    def __missing__(self, key):
+        return '?'
+
+# 任务详细信息的模板，导入时只解析一次
+_CLICK_TEXT_TMPL = ", 文字: '{target_text}'"
+_CLICK_TARGET_TMPL = ", 目标: {target_name}"
+_CLICK_COORD_TMPL = ", 坐标: ({x}, {y})"
+_ROI_TMPL = ", 区域: {roi}"
+_OCR_TMPL = ", 存入变量: {variable_name}"
+_OCR_AREA_TMPL = ", 区域: {area}"
+_FIND_ONE_TMPL = ", {target_count}个目标图片"
+
+def _click_details(task: dict) -> str:
+    if task.get('target_text'):
+        details = _CLICK_TEXT_TMPL.format_map(task)
+    elif task.get('target'):
+        details = _CLICK_TARGET_TMPL.format(target_name=os.path.basename(task['target']))
+    else:
+        details = _CLICK_COORD_TMPL.format_map(_TaskFields(task))
+    if task.get('roi'):
+        details += _ROI_TMPL.format_map(task)
+    return details
+
+def _ocr_details(task: dict) -> str:
+    details = _OCR_TMPL.format_map(_TaskFields(task))
+    if task.get('area'):
+        details += _OCR_AREA_TMPL.format_map(task)
+    return details
+
+def _find_one_details(task: dict) -> str:
+    details = _FIND_ONE_TMPL.format(target_count=len(task.get('targets', [])))
+    if task.get('roi'):
+        details += _ROI_TMPL.format_map(task)
+    return details
+
+# 任务选项 -> 任务列表中显示的标记，按显示顺序排列
+_TASK_FLAG_LABELS = (
+    ("wait_for_success", " [阻塞]"),
+    ("continue_on_fail", " [可失败]"),
+    ("pre_condition", " [条件]"),
+    ("post_action", " [动作]"),
+    ("on_fail_action", " [失败动作]"),
+    ("print_log", " [日志]"),
+    ("enable_timer", " [计时]"),
+)
+
+# 任务类型 -> 详细信息模板，只需要直接填入任务字段的类型
+_TASK_DETAIL_TEMPLATES = {
+    "wait": ", 时长: {duration}s",
+    "screenshot": ", 保存到: {save_path}",
+    "swipe": ", 从({x1},{y1})到({x2},{y2})",
+    "long_press": ", 坐标: ({x}, {y}), 时长: {duration}ms",
+    "restart_app": ", 包名: {package_name}",
+}
+
+# 任务类型 -> 生成详细信息的函数，显示内容取决于任务选项的类型
+_TASK_DETAIL_FORMATTERS = {
+    "click": _click_details,
+    "ocr": _ocr_details,
+    "find_and_click_one": _find_one_details,
+}
+
+class TaskListModel(QAbstractListModel):
+    """
+    任务列表的数据模型，直接包装任务引擎中的任务队列
+    每行的显示文本在需要绘制时才生成并缓存，不为每个任务创建列表项对象
+    """
+    HIGHLIGHT_BG = QColor("#E8E8FF")  # 循环范围高亮的背景色(柔和的淡紫色)
+    HIGHLIGHT_FG = QColor(Qt.black)   # 高亮时显式使用黑色字体
+
+    def __init__(self, task_engine: TaskEngine, parent=None):
+        super().__init__(parent)
+        self.task_engine = task_engine
+        self._indents = []  # 每行的缩进层级
+        self._texts = {}  # 行号 -> 显示文本
+        self._highlight = None  # 高亮的 (起始行, 结束行)
+        self._loop_pairs = {}  # LOOP/END_LOOP 行号 -> (LOOP行, END_LOOP行)
+        self._compute_indents()
+
+    @property
+    def tasks(self) -> list:
+        return self.task_engine.task_queue
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.tasks)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == Qt.DisplayRole:
+            text = self._texts.get(row)
+            if text is None:
+                text = self._texts[row] = self._format_task(self.tasks[row], self._indents[row])
+            return text
+        if self._highlight and self._highlight[0] <= row <= self._highlight[1]:
+            if role == Qt.BackgroundRole:
+                return self.HIGHLIGHT_BG
+            if role == Qt.ForegroundRole:
+                return self.HIGHLIGHT_FG
+        return None
+
+    def moveRows(self, source_parent, source_row, count, dest_parent, dest_child):
+        """把 source_row 开始的 count 行移动到 dest_child 之前"""
+        if count != 1 or dest_child in (source_row, source_row + 1):
+            return False
+        if not self.beginMoveRows(source_parent, source_row, source_row, dest_parent, dest_child):
+            return False
+        task = self.tasks.pop(source_row)
+        self.tasks.insert(dest_child - 1 if dest_child > source_row else dest_child, task)
+        self.endMoveRows()
+        self._update_from(min(source_row, dest_child))
+        return True
+
+    def refresh(self):
+        """任务队列被整体替换后重置模型"""
+        self.beginResetModel()
+        self._highlight = None
+        self._compute_indents()
+        self.endResetModel()
+
+    def insert_task(self, row: int, task: dict):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.tasks.insert(row, task)
+        self.endInsertRows()
+        self._update_rows(row, 1)
+
+    def remove_task(self, row: int):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.tasks.pop(row)
+        self.endRemoveRows()
+        self._update_rows(row, -1)
+
+    def replace_task(self, row: int, task: dict):
+        self.tasks[row] = task
+        self._update_rows(row, 0)
+
+    def loop_range(self, row: int):
+        """返回 row 所在 LOOP/END_LOOP 配对的 (起始行, 结束行)，不是配对的循环行时返回None"""
+        return self._loop_pairs.get(row)
+
+    def set_highlight(self, start: int, end: int):
+        """高亮 start 到 end 的行，传入 -1 取消高亮；只通知原高亮和新高亮范围内的行重绘"""
+        old_highlight = self._highlight
+        self._highlight = (start, end) if start != -1 and end != -1 else None
+        if self._highlight == old_highlight:
+            return
+        for highlight in (old_highlight, self._highlight):
+            if highlight:
+                self.dataChanged.emit(self.index(highlight[0]), self.index(highlight[1]),
+                                      [Qt.BackgroundRole, Qt.ForegroundRole])
+
+    def _update_rows(self, row: int, shift: int):
+        """
+        row 处的任务被替换(shift=0)、插入(shift=1)或删除(shift=-1)后，重新计算缩进，
+        其余行的显示文本缓存按新行号保留，只通知缩进真正变化的行刷新
+        """
+        old_indents, old_texts = self._indents, self._texts
+        old_highlight = self._highlight
+        self._highlight = None
+        self._compute_indents()
+
+        changed = [row] if shift >= 0 and row < len(self.tasks) else []
+        for new_row, indent in enumerate(self._indents):
+            if new_row < row:
+                old_row = new_row
+            elif new_row == row and shift >= 0:
+                continue
+            else:
+                old_row = new_row - shift
+            if old_indents[old_row] != indent:
+                changed.append(new_row)
+            elif old_row in old_texts:
+                self._texts[new_row] = old_texts[old_row]
+        if old_highlight:
+            changed.extend(r for r in old_highlight if r < len(self.tasks))
+
+        if changed:
+            self.dataChanged.emit(self.index(min(changed)), self.index(max(changed)))
+
+    def _update_from(self, row: int):
+        """修改从 row 开始的任务后，重新计算缩进并通知视图刷新这些行"""
+        if self._highlight:
+            row = min(row, self._highlight[0])
+        self._highlight = None
+        self._compute_indents()
+        if row < len(self.tasks):
+            self.dataChanged.emit(self.index(row), self.index(len(self.tasks) - 1))
+
+    def _compute_indents(self):
+        """按 LOOP/END_LOOP 计算每行的缩进层级，同时配对循环的起止行"""
+        indents = []
+        loop_pairs = {}
+        stack = []
+        indent_level = 0
+        for i, task in enumerate(self.tasks):
+            task_type = task.get("type")
+            if task_type == 'END_LOOP':
+                indent_level = max(0, indent_level - 1)
+                if stack:
+                    start = stack.pop()
+                    loop_pairs[start] = loop_pairs[i] = (start, i)
+            indents.append(indent_level)
+            if task_type == 'LOOP':
+                indent_level += 1
+                stack.append(i)
+        self._indents = indents
+        self._loop_pairs = loop_pairs
+        self._texts = {}
+
+    @staticmethod
+    def _format_task(task: dict, indent_level: int) -> str:
+        """生成任务的显示文本，显示更详细的信息和循环结构"""
+        indent = "    " * indent_level
+        desc = task.get("description", "未命名任务")
+
+        prefix = "".join(label for key, label in _TASK_FLAG_LABELS if task.get(key))
+
+        task_type = task['type']
+        details = f"类型: {task_type}"
+
+        if task_type == 'LOOP':
+            display_text = f"{indent}LOOP: {desc}{prefix}"
+        elif task_type == 'END_LOOP':
+            display_text = f"{indent}END_LOOP: {desc}{prefix}"
+        else:
+            template = _TASK_DETAIL_TEMPLATES.get(task_type)
+            if template is not None:
+                details += template.format_map(_TaskFields(task))
+            else:
+                formatter = _TASK_DETAIL_FORMATTERS.get(task_type)
+                if formatter is not None:
+                    details += formatter(task)
+
+            # 修正：移除 .strip() 以保留前导缩进
+            display_text = f"{indent}{prefix}{desc} [{details}]"
+        return display_text
+
 class MainWindow(QMainWindow):
+    # 后台线程解析完任务文件后发出: (路径, 任务列表, 错误信息)
+    task_file_parsed = pyqtSignal(str, object, str)
+    # 后台线程写完任务文件后发出: (路径, 错误信息)
+    task_file_saved = pyqtSignal(str, str)
+    # 后台线程写入设置失败时发出: (错误信息)
+    settings_save_failed = pyqtSignal(str)
+
     def __init__(self, task_engine: TaskEngine, adb_controller: ADBController, img_processor: ImageProcessor):
         super().__init__()
         self.task_engine = task_engine
@@ -601,13 +979,34 @@ class MainWindow(QMainWindow):
         self.worker = None
 
         # 获取配置文件的路径
-        self.settings_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-            "config", "settings.json"
-        )
+        self.settings_path = _SETTINGS_PATH
         self.settings = self._load_settings()
+        # 设置由后台线程写入磁盘，保存时界面不会被文件IO卡住
+        self._save_queue = queue.Queue()
+        self._settings_thread = threading.Thread(target=self._settings_writer_loop, daemon=True)
+        self._settings_thread.start()
+        self._task_save_thread = None
+
+        # 定时任务只用一个定时器，精确到秒即可，用最省电的计时方式
+        self.scheduler_timer = QTimer(self)
+        self.scheduler_timer.setSingleShot(True)
+        self.scheduler_timer.setTimerType(Qt.VeryCoarseTimer)
+        self.scheduler_timer.timeout.connect(self.execute_scheduled_task)
+        self._scheduler_key = None  # 上次安排定时任务时的 (是否启用, 时间, 动作)
+        self._task_edit_dialog = None  # 添加/编辑任务共用的对话框，第一次使用时创建
+        self._last_progress = None  # 上次显示的 (当前任务索引, 任务总数)
+
+        # 工作线程的日志先放进缓冲区，每30毫秒合并追加一次，避免大量日志逐行刷新界面
+        self._log_buffer = []
+        self._log_flush_timer = QTimer(self)
+        self._log_flush_timer.setSingleShot(True)
+        self._log_flush_timer.setInterval(30)
+        self._log_flush_timer.timeout.connect(self._flush_log)
 
         self.init_ui()
+        self.task_file_parsed.connect(self._on_task_file_parsed)
+        self.task_file_saved.connect(self._on_task_file_saved)
+        self.settings_save_failed.connect(self._on_settings_save_failed)
         self.load_devices()
         self.load_tasks()
         self.setup_scheduler()
@@ -634,7 +1033,14 @@ class MainWindow(QMainWindow):
         layout.addWidget(QLabel('任务列表:'))
         
         task_layout = QHBoxLayout()
-        self.task_list = QListWidget()
+        self.task_list = QListView()
+        self.task_model = TaskListModel(self.task_engine, self)
+        self.task_list.setModel(self.task_model)
+        # 每行都是单行文本，行高相同，布局和滚动时不必逐行计算sizeHint
+        self.task_list.setUniformItemSizes(True)
+        # 加载大脚本时分批布局，界面不会被一次性布局卡住
+        self.task_list.setLayoutMode(QListView.Batched)
+        self.task_list.setBatchSize(64)
         self.task_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.task_list.setMinimumWidth(400)
         task_layout.addWidget(self.task_list, 3)
@@ -695,6 +1101,8 @@ class MainWindow(QMainWindow):
         # 日志输出
         self.log_output = QTextEdit()
         self.log_output.setReadOnly(True)
+        # 只保留最近的日志行，长时间运行时文档不会无限增长，追加日志的开销保持不变
+        self.log_output.document().setMaximumBlockCount(5000)
         layout.addWidget(QLabel('运行日志:'))
         layout.addWidget(self.log_output)
         
@@ -702,9 +1110,9 @@ class MainWindow(QMainWindow):
         self.start_btn.clicked.connect(self.start_tasks)
         self.stop_btn.clicked.connect(self.stop_tasks)
         self.settings_btn.clicked.connect(self.open_settings)
-        self.add_btn.clicked.connect(lambda: self.add_task())
-        self.edit_btn.clicked.connect(lambda: self.edit_task())
-        self.del_btn.clicked.connect(lambda: self.delete_task())
+        self.add_btn.clicked.connect(self.add_task)
+        self.edit_btn.clicked.connect(self.edit_task)
+        self.del_btn.clicked.connect(self.delete_task)
         self.up_btn.clicked.connect(self.move_task_up)
         self.down_btn.clicked.connect(self.move_task_down)
         self.save_btn.clicked.connect(self.save_tasks)
@@ -712,18 +1120,18 @@ class MainWindow(QMainWindow):
         self.load_tasks_btn.clicked.connect(self.load_tasks_from_file)
         self.test_screenshot_btn.clicked.connect(self.test_screenshot)
         self.device_combo.currentIndexChanged.connect(self.on_device_changed)
-        self.task_list.itemClicked.connect(self.on_task_item_clicked)
+        self.task_list.clicked.connect(self.on_task_item_clicked)
         self.task_list.customContextMenuRequested.connect(self.show_task_context_menu)
         
+    @pyqtSlot(QPoint)
     def show_task_context_menu(self, position):
         """显示任务列表的右键上下文菜单"""
         menu = QMenu()
-        item = self.task_list.itemAt(position)
-        index = self.task_list.row(item) if item else -1
+        index = self.task_list.indexAt(position).row()
 
         # 通用操作
         add_at_end_action = menu.addAction("在末尾添加新任务")
-        add_at_end_action.triggered.connect(lambda: self.add_task(insert_index=self.task_list.count()))
+        add_at_end_action.triggered.connect(self.add_task)
 
         if index != -1:
             # 针对选中项的操作
@@ -734,148 +1142,37 @@ class MainWindow(QMainWindow):
             edit_action = menu.addAction("编辑任务")
             delete_action = menu.addAction("删除任务")
             
-            insert_above_action.triggered.connect(lambda: self.add_task(insert_index=index))
-            insert_below_action.triggered.connect(lambda: self.add_task(insert_index=index + 1))
-            edit_action.triggered.connect(lambda: self.edit_task(index=index))
-            delete_action.triggered.connect(lambda: self.delete_task(index=index))
+            insert_above_action.triggered.connect(functools.partial(self.add_task, insert_index=index))
+            insert_below_action.triggered.connect(functools.partial(self.add_task, insert_index=index + 1))
+            edit_action.triggered.connect(functools.partial(self.edit_task, index=index))
+            delete_action.triggered.connect(functools.partial(self.delete_task, index=index))
 
         menu.exec_(self.task_list.mapToGlobal(position))
 
-    def on_task_item_clicked(self, item):
+    @pyqtSlot(QModelIndex)
+    def on_task_item_clicked(self, model_index):
         """当任务项被点击时，高亮显示循环范围"""
-        # 首先重置所有项的背景和前景为默认色
-        default_bg_color = self.palette().color(self.palette().Base)
-        default_fg_color = self.palette().color(self.palette().Text)
-        for i in range(self.task_list.count()):
-            list_item = self.task_list.item(i)
-            list_item.setBackground(default_bg_color)
-            list_item.setForeground(default_fg_color)
-
-        index = self.task_list.row(item)
-        if index < 0 or index >= len(self.task_engine.task_queue):
-            return
+        # 循环配对在任务队列变化时已由模型算好，这里直接查表
+        start_index, end_index = self.task_model.loop_range(model_index.row()) or (-1, -1)
 
-        task = self.task_engine.task_queue[index]
-        task_type = task.get("type")
-
-        start_index = -1
-        end_index = -1
-
-        # 如果点击了 LOOP，向前查找匹配的 END_LOOP
-        if task_type == "LOOP":
-            start_index = index
-            level = 0
-            for i in range(index + 1, len(self.task_engine.task_queue)):
-                if self.task_engine.task_queue[i].get("type") == "LOOP":
-                    level += 1
-                elif self.task_engine.task_queue[i].get("type") == "END_LOOP":
-                    if level == 0:
-                        end_index = i
-                        break
-                    else:
-                        level -= 1
-        # 如果点击了 END_LOOP，向后查找匹配的 LOOP
-        elif task_type == "END_LOOP":
-            end_index = index
-            level = 0
-            for i in range(index - 1, -1, -1):
-                if self.task_engine.task_queue[i].get("type") == "END_LOOP":
-                    level += 1
-                elif self.task_engine.task_queue[i].get("type") == "LOOP":
-                    if level == 0:
-                        start_index = i
-                        break
-                    else:
-                        level -= 1
-
-        # 如果找到了完整的循环对，则高亮它们
-        if start_index != -1 and end_index != -1:
-            highlight_bg_color = QColor("#E8E8FF")  # 更柔和的淡紫色
-            highlight_fg_color = QColor(Qt.black)   # 显式的黑色字体
-            for i in range(start_index, end_index + 1):
-                list_item = self.task_list.item(i)
-                if list_item:
-                    list_item.setBackground(highlight_bg_color)
-                    list_item.setForeground(highlight_fg_color)
+        # 如果找到了完整的循环对，则高亮它们，否则清除之前的高亮
+        self.task_model.set_highlight(start_index, end_index)
 
     def update_task_list(self):
-        """更新任务列表UI，显示更详细的信息和循环结构"""
-        self.task_list.clear()
-        indent_level = 0
-        for task in self.task_engine.task_queue:
-            indent = "    " * indent_level
-            desc = task.get("description", "未命名任务")
-            
-            prefix = ""
-            if task.get("wait_for_success"):
-                prefix += " [阻塞]"
-            if task.get("continue_on_fail"):
-                prefix += " [可失败]"
-            if task.get("pre_condition"):
-                prefix += " [条件]"
-            if task.get("post_action"):
-                prefix += " [动作]"
-            if task.get("on_fail_action"):
-                prefix += " [失败动作]"
-            if task.get("print_log"):
-                prefix += " [日志]"
-            if task.get("enable_timer"):
-                prefix += " [计时]"
-
-            task_type = task['type']
-            details = f"类型: {task_type}"
-
-            if task_type == 'LOOP':
-                display_text = f"{indent}LOOP: {desc}{prefix}"
-                indent_level += 1
-            elif task_type == 'END_LOOP':
-                indent_level = max(0, indent_level - 1)
-                indent = "    " * indent_level
-                display_text = f"{indent}END_LOOP: {desc}{prefix}"
-            else:
-                if task_type == 'click':
-                    if task.get('target_text'):
-                        details += f", 文字: '{task['target_text']}'"
-                    elif task.get('target'):
-                        details += f", 目标: {os.path.basename(task['target'])}"
-                    else:
-                        details += f", 坐标: ({task.get('x', '?')}, {task.get('y', '?')})"
-                elif task_type == 'wait':
-                    details += f", 时长: {task.get('duration', '?')}s"
-                elif task_type == 'screenshot':
-                    details += f", 保存到: {task.get('save_path', '?')}"
-                elif task_type == 'swipe':
-                    details += f", 从({task.get('x1', '?')},{task.get('y1', '?')})到({task.get('x2', '?')},{task.get('y2', '?')})"
-                elif task_type == 'ocr':
-                    details += f", 存入变量: {task.get('variable_name', '?')}"
-                    if task.get('area'):
-                        details += f", 区域: {task.get('area')}"
-                elif task_type == 'find_and_click_one':
-                    target_count = len(task.get('targets', []))
-                    details += f", {target_count}个目标图片"
-                elif task_type == 'long_press':
-                    details += f", 坐标: ({task.get('x', '?')}, {task.get('y', '?')}), 时长: {task.get('duration', '?')}ms"
-                elif task_type == 'restart_app':
-                    details += f", 包名: {task.get('package_name', '?')}"
-
-                # 修正：移除 .strip() 以保留前导缩进
-                display_text = f"{indent}{prefix}{desc} [{details}]"
-
-            self.task_list.addItem(display_text)
+        """任务队列被整体替换或修改后，刷新任务列表显示"""
+        self.task_model.refresh()
 
+    @pyqtSlot()
     def test_screenshot(self):
         """测试截图功能"""
         if not self.adb_controller.current_device:
             QMessageBox.warning(self, "错误", "请先选择一个有效的设备。")
             return
 
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        screenshots_dir = os.path.join(base_dir, "screenshots")
-        if not os.path.exists(screenshots_dir):
-            os.makedirs(screenshots_dir)
+        os.makedirs(_SCREENSHOTS_DIR, exist_ok=True)
         
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        save_path = os.path.join(screenshots_dir, f"test_shot_{timestamp}.png")
+        save_path = os.path.join(_SCREENSHOTS_DIR, f"test_shot_{timestamp}.png")
 
         self.log_output.append(f"正在对设备 {self.adb_controller.current_device} 进行截图...")
         QApplication.processEvents() # 更新UI
@@ -889,6 +1186,7 @@ class MainWindow(QMainWindow):
             self.log_output.append(f"截图失败: {message}")
             QMessageBox.critical(self, "截图失败", f"无法完成截图，错误信息:\n{message}")
 
+    @pyqtSlot(int)
     def on_device_changed(self, index):
         """处理设备选择变化"""
         device_id = self.device_combo.itemData(index)
@@ -897,84 +1195,99 @@ class MainWindow(QMainWindow):
             self.log_output.append(f"已选择设备: {device_id}")
 
     def load_devices(self):
-        """加载ADB设备列表"""
+        """加载ADB设备列表；在线设备和上次相同时保留下拉框和当前选择的设备"""
         self.log_output.append("正在检测设备...")
         self.adb_controller.connect_all()
         devices = self.adb_controller.devices
-        self.device_combo.clear()
-
-        online_devices_found = False
-        if not devices:
-            self.log_output.append("未检测到任何ADB设备。")
-            return
 
+        online_ids = []
         for device_id, info in devices.items():
             status = info.get("status", "unknown")
             # `adb devices` for a ready device usually shows 'device'
             if status == "device":
-                self.device_combo.addItem(f"{device_id} (在线)", device_id)
-                online_devices_found = True
+                online_ids.append(device_id)
             else:
                 self.log_output.append(f"检测到设备 {device_id}，但状态为 '{status}' (非在线)。")
 
-        if online_devices_found:
-            if self.device_combo.count() > 0:
-                self.device_combo.setCurrentIndex(0)
-                self.on_device_changed(0)
+        current_ids = [self.device_combo.itemData(i) for i in range(self.device_combo.count())]
+        if online_ids and online_ids == current_ids:
+            self.log_output.append(f"设备列表没有变化，当前设备: {self.device_combo.currentData()}")
+            return
+
+        # 重新填充列表时不触发on_device_changed，选好设备后只显式调用一次
+        with QSignalBlocker(self.device_combo):
+            self.device_combo.clear()
+            for device_id in online_ids:
+                self.device_combo.addItem(f"{device_id} (在线)", device_id)
+
+        if not devices:
+            self.log_output.append("未检测到任何ADB设备。")
+            return
+
+        if online_ids:
+            self.device_combo.setCurrentIndex(0)
+            self.on_device_changed(0)
         else:
             self.log_output.append("没有找到状态为 'device' 的在线设备。请检查模拟器是否完全启动，以及是否已授权USB调试。")
 
+    def _task_dialog(self, task=None) -> TaskEditDialog:
+        """返回共用的任务编辑对话框并填入任务，不必每次添加/编辑都重新创建整个对话框"""
+        if self._task_edit_dialog is None:
+            self._task_edit_dialog = TaskEditDialog(task, self)
+        else:
+            self._task_edit_dialog.load(task)
+        return self._task_edit_dialog
+
+    @pyqtSlot()
     def add_task(self, insert_index=None):
-        """添加新任务，可以指定插入位置"""
-        dialog = TaskEditDialog(parent=self)
+        """添加新任务，可以指定插入位置，未指定时添加到末尾"""
+        dialog = self._task_dialog()
         if dialog.exec_() == QDialog.Accepted:
             task = dialog.get_task()
             if insert_index is None or insert_index < 0 or insert_index > len(self.task_engine.task_queue):
                 # 默认在末尾添加
-                self.task_engine.task_queue.append(task)
-            else:
-                self.task_engine.task_queue.insert(insert_index, task)
-            self.update_task_list()
+                insert_index = len(self.task_engine.task_queue)
+            self.task_model.insert_task(insert_index, task)
             
+    @pyqtSlot()
     def edit_task(self, index=None):
         """编辑选中任务，可以指定索引"""
         if index is None:
-            index = self.task_list.currentRow()
+            index = self.task_list.currentIndex().row()
         
         if 0 <= index < len(self.task_engine.task_queue):
             task = self.task_engine.task_queue[index]
-            dialog = TaskEditDialog(task, self)
+            dialog = self._task_dialog(task)
             if dialog.exec_() == QDialog.Accepted:
-                self.task_engine.task_queue[index] = dialog.get_task()
-                self.update_task_list()
+                self.task_model.replace_task(index, dialog.get_task())
                 
+    @pyqtSlot()
     def delete_task(self, index=None):
         """删除选中任务，可以指定索引"""
         if index is None:
-            index = self.task_list.currentRow()
+            index = self.task_list.currentIndex().row()
             
         if 0 <= index < len(self.task_engine.task_queue):
-            self.task_engine.task_queue.pop(index)
-            self.update_task_list()
+            self.task_model.remove_task(index)
             
+    @pyqtSlot()
     def move_task_up(self):
         """上移任务"""
-        index = self.task_list.currentRow()
+        index = self.task_list.currentIndex().row()
         if index > 0:
-            task = self.task_engine.task_queue.pop(index)
-            self.task_engine.task_queue.insert(index - 1, task)
-            self.update_task_list()
-            self.task_list.setCurrentRow(index - 1)
+            self.task_model.moveRows(QModelIndex(), index, 1, QModelIndex(), index - 1)
+            self.task_list.setCurrentIndex(self.task_model.index(index - 1))
             
+    @pyqtSlot()
     def move_task_down(self):
         """下移任务"""
-        index = self.task_list.currentRow()
+        index = self.task_list.currentIndex().row()
         if 0 <= index < len(self.task_engine.task_queue) - 1:
-            task = self.task_engine.task_queue.pop(index)
-            self.task_engine.task_queue.insert(index + 1, task)
-            self.update_task_list()
-            self.task_list.setCurrentRow(index + 1)
+            # moveRows 的目标位置是移动前的行号，移到下一行之后即 index + 2
+            self.task_model.moveRows(QModelIndex(), index, 1, QModelIndex(), index + 2)
+            self.task_list.setCurrentIndex(self.task_model.index(index + 1))
 
+    @pyqtSlot()
     def new_script(self):
         """创建一个新的空白任务脚本"""
         reply = QMessageBox.question(self, '确认', '您确定要创建一个新脚本吗？\n所有未保存的更改都将丢失。',
@@ -987,15 +1300,13 @@ class MainWindow(QMainWindow):
             self._save_settings()
             self.log_output.append("已创建新脚本。")
             
+    @pyqtSlot()
     def save_tasks(self):
         """保存当前任务列表到文件"""
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        config_dir = os.path.join(base_dir, "config")
-        
         path, _ = QFileDialog.getSaveFileName(
             self, 
             "保存任务文件", 
-            config_dir,
+            _CONFIG_DIR,
             "JSON 文件 (*.json)"
         )
         
@@ -1003,16 +1314,38 @@ class MainWindow(QMainWindow):
             self.log_output.append("保存操作已取消。")
             return
 
+        # 序列化和写文件在后台线程进行，传入任务列表的副本，保存期间可以继续编辑
+        tasks = list(self.task_engine.task_queue)
+        self._task_save_thread = threading.Thread(target=self._write_task_file, args=(path, tasks), daemon=True)
+        self._task_save_thread.start()
+
+    def _write_task_file(self, path: str, tasks: list):
+        """后台线程：写入任务文件，先写临时文件再替换，结果通过信号交回界面线程"""
+        tmp_path = path + ".tmp"
         try:
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(self.task_engine.task_queue, f, indent=2, ensure_ascii=False)
-            self.log_output.append(f"任务已成功保存到: {path}")
-            # 保存成功后，记录路径
-            self.settings['last_task_path'] = path
-            self._save_settings()
+            if _HAS_ORJSON:
+                # OPT_NON_STR_KEYS: 与json一样把非字符串的键转成字符串，而不是报错
+                data = orjson.dumps(tasks, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            else:
+                data = json.dumps(tasks, indent=2, ensure_ascii=False).encode('utf-8')
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.task_file_saved.emit(path, "")
         except Exception as e:
-            self.log_output.append(f"保存任务失败: {e}")
-            QMessageBox.critical(self, "错误", f"无法保存任务文件:\n{e}")
+            self.task_file_saved.emit(path, str(e))
+
+    @pyqtSlot(str, str)
+    def _on_task_file_saved(self, path: str, error: str):
+        """在界面线程中报告保存结果"""
+        if error:
+            self.log_output.append(f"保存任务失败: {error}")
+            QMessageBox.critical(self, "错误", f"无法保存任务文件:\n{error}")
+            return
+        self.log_output.append(f"任务已成功保存到: {path}")
+        # 保存成功后，记录路径
+        self.settings['last_task_path'] = path
+        self._save_settings()
 
     def load_tasks(self):
         """从配置文件记录的路径加载任务（程序启动时调用）"""
@@ -1023,15 +1356,13 @@ class MainWindow(QMainWindow):
         else:
             self.log_output.append("未找到上次使用的脚本记录，请手动加载。")
 
+    @pyqtSlot()
     def load_tasks_from_file(self):
         """通过文件对话框加载任务"""
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        config_dir = os.path.join(base_dir, "config")
-        
         path, _ = QFileDialog.getOpenFileName(
             self, 
             "选择任务文件", 
-            config_dir, 
+            _CONFIG_DIR, 
             "JSON 文件 (*.json)"
         )
         
@@ -1039,23 +1370,36 @@ class MainWindow(QMainWindow):
             self._load_task_file(path)
 
     def _load_task_file(self, path: str):
-        """从指定路径加载任务文件的辅助函数"""
+        """从指定路径加载任务文件的辅助函数，读取和解析在后台线程进行"""
+        if not os.path.exists(path):
+            self.log_output.append(f"任务文件不存在: {path}")
+            return
+        threading.Thread(target=self._parse_task_file, args=(path,), daemon=True).start()
+
+    def _parse_task_file(self, path: str):
+        """后台线程：读取并解析任务文件，结果通过信号交回界面线程"""
         try:
-            if os.path.exists(path):
-                with open(path, 'r', encoding='utf-8') as f:
-                    tasks = json.load(f)
-                    self.task_engine.load_tasks(tasks)
-                    self.update_task_list()
-                self.log_output.append(f"已从 {path} 加载任务。")
-                # 加载成功后，记录路径
-                self.settings['last_task_path'] = path
-                self._save_settings()
-            else:
-                self.log_output.append(f"任务文件不存在: {path}")
+            with open(path, 'rb') as f:
+                data = f.read()
+            tasks = orjson.loads(data) if _HAS_ORJSON else json.loads(data)
+            self.task_file_parsed.emit(path, tasks, "")
         except Exception as e:
-            self.log_output.append(f"从 {path} 加载任务失败: {e}")
-            QMessageBox.critical(self, "错误", f"无法加载或解析任务文件:\n{e}")
-    
+            self.task_file_parsed.emit(path, None, str(e))
+
+    @pyqtSlot(str, object, str)
+    def _on_task_file_parsed(self, path: str, tasks, error: str):
+        """在界面线程中应用解析好的任务，整个列表只重置一次模型"""
+        if error:
+            self.log_output.append(f"从 {path} 加载任务失败: {error}")
+            QMessageBox.critical(self, "错误", f"无法加载或解析任务文件:\n{error}")
+            return
+        self.task_engine.load_tasks(tasks)
+        self.update_task_list()
+        self.log_output.append(f"已从 {path} 加载任务。")
+        # 加载成功后，记录路径
+        self.settings['last_task_path'] = path
+        self._save_settings()
+
     def _load_settings(self):
         """从settings.json加载配置"""
         try:
@@ -1067,13 +1411,42 @@ class MainWindow(QMainWindow):
         return {}
 
     def _save_settings(self):
-        """将当前设置保存到settings.json"""
+        """将当前设置的副本交给后台线程保存到settings.json"""
+        self._save_queue.put(dict(self.settings))
+
+    def _settings_writer_loop(self):
+        """后台写入线程：连续多次保存时只写最新的一份，收到None时退出"""
+        while True:
+            items = [self._save_queue.get()]
+            while True:
+                try:
+                    items.append(self._save_queue.get_nowait())
+                except queue.Empty:
+                    break
+            snapshots = [item for item in items if item is not None]
+            if snapshots:
+                self._write_settings(snapshots[-1])
+            for _ in items:
+                self._save_queue.task_done()
+            if len(snapshots) != len(items):
+                return
+
+    def _write_settings(self, settings: dict):
+        """先写临时文件再替换，写入中途退出也不会损坏settings.json"""
+        tmp_path = self.settings_path + ".tmp"
         try:
-            with open(self.settings_path, 'w', encoding='utf-8') as f:
-                json.dump(self.settings, f, indent=4, ensure_ascii=False)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(settings, f, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, self.settings_path)
         except Exception as e:
-            self.log_output.append(f"保存设置失败: {e}")
+            self.settings_save_failed.emit(str(e))
+
+    @pyqtSlot(str)
+    def _on_settings_save_failed(self, error: str):
+        """在界面线程中报告设置保存失败"""
+        self.log_output.append(f"保存设置失败: {error}")
         
+    @pyqtSlot()
     def start_tasks(self):
         """开始执行任务"""
         if not self.task_engine.task_queue:
@@ -1086,14 +1459,38 @@ class MainWindow(QMainWindow):
         self.start_btn.setEnabled(False)
         self.stop_btn.setEnabled(True)
         self.log_output.append("开始执行任务...")
+        self._last_progress = None  # 停止/完成时进度显示已被重置，新的运行需要重新显示
 
         # 创建并启动工作线程
         self.worker = Worker(self.task_engine)
-        self.worker.progress.connect(self.update_progress_display)
+        self.worker.progress.connect(self._on_worker_progress, Qt.QueuedConnection)
         self.worker.finished.connect(self.on_task_finished)
-        self.worker.log.connect(self.log_output.append)
+        self.worker.log.connect(self._enqueue_log)
         self.worker.start()
 
+    @pyqtSlot(str)
+    def _enqueue_log(self, text):
+        """缓存工作线程发来的日志，等定时器到期后一起显示"""
+        self._log_buffer.append(text)
+        if not self._log_flush_timer.isActive():
+            self._log_flush_timer.start()
+
+    @pyqtSlot()
+    def _flush_log(self):
+        """把缓冲区中的日志一次性追加到日志框"""
+        self._log_flush_timer.stop()
+        if self._log_buffer:
+            self.log_output.append("\n".join(self._log_buffer))
+            self._log_buffer.clear()
+
+    @pyqtSlot(int, int)
+    def _on_worker_progress(self, current, total):
+        """显示工作线程合并后的最新进度，而不是信号携带的可能已过时的值"""
+        if self.worker is not None:
+            current, total = self.worker.take_progress() or (current, total)
+        self.update_progress_display(current, total)
+
+    @pyqtSlot()
     def stop_tasks(self):
         """停止执行任务"""
         if self.worker and self.worker.isRunning():
@@ -1104,8 +1501,11 @@ class MainWindow(QMainWindow):
         self.next_task_label.setText("下一任务: 无")
         self.progress_bar.setFormat("已停止")
 
+    @pyqtSlot(str)
     def on_task_finished(self, message):
         """任务完成后的处理"""
+        # 先显示还在缓冲区里的日志，保证顺序
+        self._flush_log()
         # 获取并显示运行摘要
         summary = self.task_engine.get_run_summary()
         self.log_output.append(summary)
@@ -1120,10 +1520,16 @@ class MainWindow(QMainWindow):
         self.progress_bar.setFormat("0/0")
 
     def setup_scheduler(self):
-        """设置或重置定时任务"""
-        # 如果定时器已存在且在运行，则停止它
-        if hasattr(self, 'scheduler_timer') and self.scheduler_timer.isActive():
-            self.scheduler_timer.stop()
+        """设置或重置定时任务，定时设置没有变化且定时器仍在等待时保持不变"""
+        scheduler_key = (self.settings.get("timer_enabled", False),
+                         self.settings.get("timer_time", "00:00:00"),
+                         self.settings.get("timer_action"))
+        if scheduler_key == self._scheduler_key and self.scheduler_timer.isActive():
+            return
+        self._scheduler_key = scheduler_key
+
+        # 如果定时器在运行，则停止它
+        self.scheduler_timer.stop()
 
         if not self.settings.get("timer_enabled", False):
             self.log_output.append("定时器功能未启用。")
@@ -1139,14 +1545,12 @@ class MainWindow(QMainWindow):
             # 如果今天的时间已过，则安排在明天
             msecs_to_action += 24 * 60 * 60 * 1000
 
-        self.scheduler_timer = QTimer(self)
-        self.scheduler_timer.setSingleShot(True)
-        self.scheduler_timer.timeout.connect(self.execute_scheduled_task)
         self.scheduler_timer.start(msecs_to_action)
 
         action = self.settings.get("timer_action")
         self.log_output.append(f"已设置定时任务: [{action}] 将在 {action_time.toString('HH:mm:ss')} 执行。")
 
+    @pyqtSlot()
     def execute_scheduled_task(self):
         """执行预定的任务"""
         # 再次检查设置，以防在等待期间被禁用
@@ -1176,27 +1580,48 @@ class MainWindow(QMainWindow):
     def shutdown_system(self):
         """执行系统关机命令"""
         self.log_output.append("将在1分钟后关机...")
-        QMessageBox.warning(self, "定时关机", "系统将在1分钟后关机。请保存您的工作。")
-        os.system("shutdown -s -t 60")
+        self._run_shutdown_command("-s", "定时关机", "系统将在1分钟后关机。请保存您的工作。")
 
     def restart_system(self):
         """执行系统重启命令"""
         self.log_output.append("将在1分钟后重启...")
-        QMessageBox.warning(self, "定时重启", "系统将在1分钟后重启。请保存您的工作。")
-        os.system("shutdown -r -t 60")
+        self._run_shutdown_command("-r", "定时重启", "系统将在1分钟后重启。请保存您的工作。")
 
+    def _run_shutdown_command(self, mode: str, title: str, notice: str):
+        """
+        启动系统shutdown命令后立即返回，不等待命令结束，再显示非模态提示；
+        无人值守时定时关机/重启也不会卡在等待点击确认的对话框上
+        """
+        try:
+            # CREATE_NO_WINDOW 只在Windows上存在，避免弹出控制台窗口
+            subprocess.Popen(["shutdown", mode, "-t", "60"], close_fds=True,
+                             creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0))
+        except OSError as e:
+            self.log_output.append(f"执行shutdown命令失败: {e}")
+            return
+        box = QMessageBox(QMessageBox.Warning, title, notice, QMessageBox.Ok, self)
+        box.setAttribute(Qt.WA_DeleteOnClose)
+        box.show()
+
+    @pyqtSlot()
     def open_settings(self):
         """打开设置对话框"""
+        # 设置对话框会直接写文件，先等后台线程写完，避免旧的设置覆盖新的
+        self._save_queue.join()
+        # 对话框会直接修改 self.settings，先记下影响设备列表和定时器的旧值
+        old_values = {key: self.settings.get(key) for key in _DEVICE_SETTING_KEYS + _TIMER_SETTING_KEYS}
         dialog = SettingsDialog(self.settings, self)
         if dialog.exec_() == QDialog.Accepted:
             # 设置对话框已经保存了设置，我们只需重新加载它们
             self.settings = self._load_settings()
+            changed = {key for key, value in old_values.items() if self.settings.get(key) != value}
             self.log_output.append("设置已保存。正在应用新设置...")
             
             try:
                 # 更新ADB Controller
                 self.adb_controller.adb_path = self.settings.get("adb_path", "adb")
                 self.adb_controller.device_addrs = self.settings.get("device_addrs", [])
+                self.adb_controller.sendevent_tap = self.settings.get("sendevent_tap", False)
                 
                 # 更新Image Processor的Tesseract路径
                 tesseract_path = self.settings.get("tesseract_path")
@@ -1209,19 +1634,26 @@ class MainWindow(QMainWindow):
                 self.log_output.append(f"默认OCR语言已更新为: {ocr_language}")
 
                 # 更新任务延时
-                task_delay = self.settings.get("task_delay", 0.01)
+                task_delay = self.settings.get("task_delay", 0)
                 self.task_engine.task_delay = task_delay
                 self.log_output.append(f"任务延时已更新为: {task_delay * 1000} ms")
 
-                self.log_output.append("设置已更新。正在重新加载设备...")
-                self.load_devices()
-                self.log_output.append("正在重新应用定时器设置...")
-                self.setup_scheduler()
+                # 重新检测设备要访问ADB，比较慢，只在ADB路径或设备地址变化时进行
+                if changed.intersection(_DEVICE_SETTING_KEYS):
+                    self.log_output.append("设置已更新。正在重新加载设备...")
+                    self.load_devices()
+                if changed.intersection(_TIMER_SETTING_KEYS):
+                    self.log_output.append("正在重新应用定时器设置...")
+                    self.setup_scheduler()
             except Exception as e:
                 self.log_output.append(f"应用新设置失败: {e}")
             
     def update_progress_display(self, current_index, total):
         """更新进度条和当前/下一个任务标签"""
+        # 进度没有变化时不再重复设置进度条和标签
+        if (current_index, total) == self._last_progress:
+            return
+        self._last_progress = (current_index, total)
         if total > 0:
             # 更新进度条
             progress_value = int(((current_index + 1) / total) * 100)
@@ -1248,6 +1680,11 @@ class MainWindow(QMainWindow):
         if self.worker and self.worker.isRunning():
             self.worker.stop()
             self.worker.wait()  # 等待线程结束
+        if self._task_save_thread is not None:
+            self._task_save_thread.join()  # 等待正在保存的任务文件写完
+        self._save_queue.put(None)
+        self._settings_thread.join()  # 等待未写完的设置落盘
+        self.adb_controller.close()  # 关闭持久化的ADB shell
         event.accept()
 
 class SettingsDialog(QDialog):
@@ -1255,10 +1692,7 @@ class SettingsDialog(QDialog):
     def __init__(self, settings, parent=None):
         super().__init__(parent)
         self.setWindowTitle("设置")
-        self.settings_path = os.path.join(
-            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
-            "config", "settings.json"
-        )
+        self.settings_path = _SETTINGS_PATH
         self.settings = settings
 
         layout = QVBoxLayout(self)
@@ -1309,8 +1743,9 @@ class SettingsDialog(QDialog):
         form_layout.addRow("图像匹配置信度:", self.confidence_edit)
 
         # 新增：任务延时
-        self.task_delay_edit = QLineEdit(str(self.settings.get("task_delay", 0.01) * 1000))
-        self.task_delay_edit.setValidator(QIntValidator(10, 60000))
+        self.task_delay_edit = QLineEdit(str(round(self.settings.get("task_delay", 0) * 1000)))
+        self.task_delay_edit.setValidator(QIntValidator(0, 60000))
+        self.task_delay_edit.setToolTip("每个任务执行后的额外等待时间，为0时不等待")
         form_layout.addRow("任务延时(ms):", self.task_delay_edit)
 
         layout.addLayout(form_layout)
@@ -1341,18 +1776,21 @@ class SettingsDialog(QDialog):
         layout.addWidget(buttons)
 
 
+    @pyqtSlot()
     def browse_adb_path(self):
         """浏览ADB可执行文件"""
         path, _ = QFileDialog.getOpenFileName(self, "选择ADB可执行文件", "", "adb.exe (adb.exe)")
         if path:
             self.adb_path_edit.setText(path)
 
+    @pyqtSlot()
     def browse_tesseract_path(self):
         """浏览Tesseract可执行文件"""
         path, _ = QFileDialog.getOpenFileName(self, "选择Tesseract可执行文件", "", "tesseract.exe (tesseract.exe)")
         if path:
             self.tesseract_path_edit.setText(path)
 
+    @pyqtSlot()
     def save_and_accept(self):
         """保存设置并关闭对话框"""
         self.settings["adb_path"] = self.adb_path_edit.text()
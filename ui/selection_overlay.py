@@ -8,11 +8,13 @@
 """
 
 from PyQt5.QtWidgets import QWidget, QApplication
-from PyQt5.QtCore import Qt, QRect, QPoint
-from PyQt5.QtGui import QPainter, QPen, QColor
+from PyQt5.QtCore import Qt, QRect, QTimer
+from PyQt5.QtGui import QGuiApplication, QPainter, QPen, QColor, QPixmap, QRegion
 
 class SelectionOverlay(QWidget):
     """屏幕选择覆盖层"""
+    DIM_COLOR = QColor(0, 0, 0, 100)  # 选区以外的半透明黑色背景
+
     def __init__(self):
         super().__init__()
         # 设置窗口属性：无边框、总在最前、工具窗口类型
@@ -22,79 +24,153 @@ class SelectionOverlay(QWidget):
             Qt.Tool
         )
         # 设置背景透明
+        # 注意不要设置 WA_PaintOnScreen 来跳过双缓冲：Qt5 中这个属性只适用于自己用原生接口绘制的控件，
+        # 设置后 QPainter 无法再绘制，半透明背景也依赖后备缓冲区
         self.setAttribute(Qt.WA_TranslucentBackground)
         # 设置鼠标样式为十字准星
         self.setCursor(Qt.CrossCursor)
 
-        # 获取所有屏幕的几何信息，并设置为全屏
-        screen_geometry = QApplication.desktop().geometry()
+        self._dim_pixmap = None  # 整屏的半透明背景图，由 _fit_screen 生成
+        self._border_pen = QPen(Qt.red, 2, Qt.SolidLine)  # 选区的红色边框
+
+        # 鼠标移动事件可能每秒上千次，合并成最多每16毫秒(约60帧)重绘一次
+        self._repaint_timer = QTimer(self)
+        self._repaint_timer.setSingleShot(True)
+        self._repaint_timer.setInterval(16)
+        self._repaint_timer.timeout.connect(self._update_selection)
+        self.reset()
+
+    def _fit_screen(self):
+        """覆盖所有屏幕合起来的虚拟桌面，屏幕布局没有变化时沿用已有的背景图"""
+        screen_geometry = QGuiApplication.primaryScreen().virtualGeometry()
+        if self._dim_pixmap is not None and screen_geometry == self.geometry():
+            return
         self.setGeometry(screen_geometry)
 
-        self.begin = QPoint()
-        self.end = QPoint()
+        # 预先画好整屏的半透明黑色背景，绘制时直接贴图，不用每次重新混合颜色
+        self._dim_pixmap = QPixmap(screen_geometry.size())
+        self._dim_pixmap.fill(Qt.transparent)
+        painter = QPainter(self._dim_pixmap)
+        painter.fillRect(self._dim_pixmap.rect(), self.DIM_COLOR)
+        painter.end()
+
+    def reset(self):
+        """清除上一次的选择状态，重复使用覆盖层前调用"""
+        self._repaint_timer.stop()
+        # 选择起点和终点的坐标，直接保存整数，鼠标事件中不必创建 QPoint 对象
+        self._bx = self._by = self._ex = self._ey = 0
         self.is_selecting = False
+        self._sel_rect = QRect()  # 当前显示的选区，只在重绘选区时更新
+        self._last_rect = QRect()  # 上次绘制的选区(含边框)，拖动时只重绘变化的部分
+        self._fit_screen()
 
     def paintEvent(self, event):
         """绘制事件，用于画选择框"""
-        if self.is_selecting:
-            painter = QPainter(self)
-            # 半透明黑色背景
-            painter.fillRect(self.rect(), QColor(0, 0, 0, 100))
-            
-            # 绘制选区
-            selection_rect = QRect(self.begin, self.end).normalized()
-            # 清除选区内的半透明背景，使其变亮
-            painter.setCompositionMode(QPainter.CompositionMode_Clear)
-            painter.fillRect(selection_rect, Qt.transparent)
-            
-            # 重新设置绘制模式并画红色边框
-            painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
-            pen = QPen(Qt.red, 2, Qt.SolidLine)
-            painter.setPen(pen)
-            painter.drawRect(selection_rect)
+        # 还没开始拖动时覆盖层完全透明，窗口显示或被遮挡后重绘时都不需要画任何东西
+        if not self.is_selecting:
+            return
+        painter = QPainter(self)
+        selection_rect = self._sel_rect
+        # 只在需要更新的区域内、选区以外贴上半透明背景，选区内保持透明
+        dim_region = event.region().subtracted(QRegion(selection_rect))
+        if not dim_region.isEmpty():
+            painter.setClipRegion(dim_region)
+            dirty_rect = dim_region.boundingRect()
+            painter.drawPixmap(dirty_rect, self._dim_pixmap, dirty_rect)
+            painter.setClipping(False)
+
+        # 画红色边框
+        painter.setPen(self._border_pen)
+        painter.drawRect(selection_rect)
 
     def mousePressEvent(self, event):
         """鼠标按下事件"""
         if event.button() == Qt.LeftButton:
-            self.begin = event.pos()
-            self.end = self.begin
+            self._bx, self._by = event.x(), event.y()
+            self._ex, self._ey = self._bx, self._by
             self.is_selecting = True
-            self.update()
+            self._sel_rect = self._selection_rect()
+            self._last_rect = self._sel_rect.adjusted(-2, -2, 2, 2)
+            # 开始选择时整个屏幕变暗，需要完整重绘一次
+            self._request_paint(self.rect())
 
     def mouseMoveEvent(self, event):
         """鼠标移动事件"""
         if self.is_selecting:
-            self.end = event.pos()
-            self.update()
+            self._ex, self._ey = event.x(), event.y()
+            if not self._repaint_timer.isActive():
+                self._repaint_timer.start()
+
+    def _update_selection(self):
+        """重绘选区的变化，由重绘定时器调用"""
+        if not self.is_selecting:
+            return
+        # 选区外的半透明背景不变，只需重绘旧选区和新选区覆盖的范围
+        self._sel_rect = self._selection_rect()
+        new_rect = self._sel_rect.adjusted(-2, -2, 2, 2)
+        self._request_paint(self._last_rect.united(new_rect))
+        self._last_rect = new_rect
+
+    def _request_paint(self, rect):
+        """
+        请求重绘指定区域
+        所有重绘都通过这里用 update(rect) 排队，Qt 会把多次请求合并成一次绘制；
+        不要改用 repaint()，它会立即同步绘制，拖动时每个鼠标事件都会重画一次
+        """
+        self.update(rect)
+
+    def _selection_rect(self):
+        """起点和终点围成的选区(包含两端的像素)"""
+        x1, x2 = min(self._bx, self._ex), max(self._bx, self._ex)
+        y1, y2 = min(self._by, self._ey), max(self._by, self._ey)
+        return QRect(x1, y1, x2 - x1 + 1, y2 - y1 + 1)
 
     def mouseReleaseEvent(self, event):
         """鼠标释放事件"""
         if event.button() == Qt.LeftButton:
             self.is_selecting = False
+            self._repaint_timer.stop()
             
-            selection_rect = QRect(self.begin, self.end).normalized()
-            x1, y1 = selection_rect.left(), selection_rect.top()
-            x2, y2 = selection_rect.right(), selection_rect.bottom()
+            # 坐标包含两端的像素，与原来 QRect 的 right()/bottom() 一致
+            x1, x2 = min(self._bx, self._ex), max(self._bx, self._ex)
+            y1, y2 = min(self._by, self._ey), max(self._by, self._ey)
             
+            # 完成后先关闭窗口
+            self.close()
+
             # 确保不是一个无效的点击
             if x1 != x2 and y1 != y2:
                 coords_text = f"{x1},{y1},{x2},{y2}"
-                clipboard = QApplication.clipboard()
-                clipboard.setText(coords_text)
-                print(f"坐标已复制到剪贴板: {coords_text}")
-            
-            # 完成后关闭窗口
-            self.close()
+                # 写剪贴板要等其他程序响应，可能卡住几十毫秒，放到下一次事件循环，不推迟覆盖层消失
+                QTimer.singleShot(0, lambda: self._copy_coords(coords_text))
+
+    def _copy_coords(self, coords_text):
+        """把选区坐标复制到剪贴板"""
+        QApplication.clipboard().setText(coords_text)
 
     def keyPressEvent(self, event):
         """按键事件，允许按ESC取消"""
         if event.key() == Qt.Key_Escape:
             self.close()
 
+_overlay = None
+
+def get_overlay() -> SelectionOverlay:
+    """
+    获取共用的覆盖层，重置后返回
+    关闭覆盖层只是隐藏窗口，重复使用可以省去每次创建全屏窗口和背景图的开销
+    """
+    global _overlay
+    if _overlay is None:
+        _overlay = SelectionOverlay()
+    else:
+        _overlay.reset()
+    return _overlay
+
 if __name__ == '__main__':
     # 用于独立测试
     import sys
     app = QApplication(sys.argv)
-    overlay = SelectionOverlay()
+    overlay = get_overlay()
     overlay.show()
     sys.exit(app.exec_())